@@ -0,0 +1,201 @@
+###################################################################################################
+#
+#   Program: MLEM2 Benchmarks
+#
+#   Description: Runs the preprocessing and rule induction of mlem2.py phase by phase on the bundled
+#                datasets (smallest first) and on synthetic datasets of increasing size, recording
+#                the wall time and peak memory of every phase. Every dataset runs in its own worker
+#                process and the results are written to a JSON file so runs can be compared.
+#
+###################################################################################################
+
+from collections import OrderedDict
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import mlem2
+
+# Letters used for the values of synthetic symbolic attributes
+SYMBOLS = "abcdefghijklmnopqrstuvwxyz"
+
+# Writes a synthetic LERS dataset to fileName. Each case gets a random decision out of `decisions`
+# and its attribute values lean towards that decision, so the rules have something to find:
+# numeric values are whole numbers drawn around a per-decision mean and symbolic values match the
+# decision half of the time. Every value is missing with probability missingRate, as a lost (?),
+# don't care (*) or attribute-concept (-) value.
+def generateDataset(fileName, cases, numeric = 4, symbolic = 4, missingRate = 0.0, decisions = 2,
+                    seed = 0):
+    generator = random.Random(seed)
+    names = ["n{}".format(index + 1) for index in range(numeric)] + \
+            ["s{}".format(index + 1) for index in range(symbolic)]
+    symbolCount = max(decisions, 3)
+
+    with open(fileName, "w") as outputFile:
+        outputFile.write("< {} d >\n".format(" ".join("a" for name in names)))
+        outputFile.write("[ {} decision ]\n".format(" ".join(names)))
+
+        for case in range(cases):
+            decision = generator.randrange(decisions)
+            values = []
+            for index in range(numeric):
+                values.append(str(round(generator.gauss(5 * decision + index, 3))))
+            for index in range(symbolic):
+                if generator.random() < 0.5:
+                    values.append(SYMBOLS[(decision + index) % symbolCount])
+                else:
+                    values.append(SYMBOLS[generator.randrange(symbolCount)])
+
+            for index in range(len(values)):
+                if generator.random() < missingRate:
+                    values[index] = generator.choice("?*-")
+
+            outputFile.write("{} d{}\n".format(" ".join(values), decision + 1))
+
+    return fileName
+
+# Benchmarks one dataset: the phases of mlem2.preprocess, then one induction per rule type, each on
+# its own copy of the block table. Memory is traced for the whole run, so the peak of every phase
+# is measured on top of what the earlier phases left allocated. Returns the benchmark record.
+def benchmarkDataset(fileName, ruleTypes, flags, memory):
+    vars(mlem2).update(flags)
+    record = OrderedDict(dataset = os.path.basename(fileName))
+    if memory:
+        tracemalloc.start()
+    mlem2.startInstrumentation("tracemalloc" if memory else None)
+
+    dataset = mlem2.Dataset(fileName)
+    record["rules"] = OrderedDict()
+    for ruleType in ruleTypes:
+        record["rules"][ruleType] = len(mlem2.induce(dataset, ruleType))
+
+    report = mlem2.stopInstrumentation().report()
+    if memory:
+        tracemalloc.stop()
+
+    record["cases"] = dataset.cases
+    record["attributes"] = len(dataset.attributes) - 1
+    record["numeric"] = dataset.attrTypes.count(2)
+    record["incomplete"] = dataset.incomplete
+    record["phases"] = report["phases"]
+    record["counters"] = report["counters"]
+    record["seconds"] = sum(phase["seconds"] for phase in record["phases"].values())
+    return record
+
+# Entry point of a benchmark worker process: benchmarks one dataset and sends back its record
+def benchmarkWorker(job, connection):
+    fileName = job[0]
+    try:
+        record = benchmarkDataset(*job)
+        record["status"] = "ok"
+    except mlem2.DatasetError:
+        record = OrderedDict(dataset = os.path.basename(fileName), status = "invalid")
+    except Exception as error:
+        record = OrderedDict(dataset = os.path.basename(fileName),
+                             status = "error ({})".format(type(error).__name__))
+    connection.send(record)
+    connection.close()
+
+# Returns the bundled datasets, smallest first
+def bundledDatasets(directory):
+    return sorted(mlem2.batchInputFiles([directory]), key = os.path.getsize)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmark the phases of mlem2.py.")
+    parser.add_argument("datasets", nargs = "*",
+                        help = "dataset files, directories or globs (default: testfiles)")
+    parser.add_argument("--rules", nargs = "+", choices = ["certain", "possible"],
+                        default = ["certain", "possible"], help = "rule types to induce")
+    parser.add_argument("--output", default = "benchmark.json", help = "JSON file for the results")
+    parser.add_argument("--timeout", type = float, default = 0,
+                        help = "seconds allowed per dataset (0 for no limit)")
+    parser.add_argument("--jobs", type = int, default = 1,
+                        help = "datasets benchmarked at once (1 keeps the timings comparable)")
+    parser.add_argument("--no-memory", action = "store_true",
+                        help = "don't trace memory (tracing slows every phase down)")
+    parser.add_argument("--flags", nargs = "+", default = [], choices = mlem2.BATCHFLAGS,
+                        metavar = "FLAG", help = "engine flags to enable, e.g. BITMAPBLOCKS")
+    parser.add_argument("--cutpoints", choices = mlem2.CUTPOINTSTRATEGIES,
+                        default = mlem2.CUTPOINTSTRATEGY, help = "cutpoint strategy")
+    parser.add_argument("--max-cutpoints", type = int, default = mlem2.MAXCUTPOINTS,
+                        help = "cutpoints kept per numeric attribute (0 for no cap)")
+    parser.add_argument("--scale", nargs = "+", type = int, default = [], metavar = "CASES",
+                        help = "case counts of synthetic datasets to benchmark")
+    parser.add_argument("--numeric", type = int, default = 4,
+                        help = "numeric attributes of the synthetic datasets")
+    parser.add_argument("--symbolic", type = int, default = 4,
+                        help = "symbolic attributes of the synthetic datasets")
+    parser.add_argument("--missing", type = float, default = 0.0,
+                        help = "missing value rate of the synthetic datasets")
+    parser.add_argument("--decisions", type = int, default = 2,
+                        help = "decision values of the synthetic datasets")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the synthetic datasets")
+    args = parser.parse_args(argv)
+
+    if args.datasets:
+        fileNames = mlem2.batchInputFiles(args.datasets)
+    elif args.scale:
+        fileNames = []
+    else:
+        fileNames = bundledDatasets("testfiles")
+
+    # Synthetic datasets for the scaling curves
+    syntheticDirectory = tempfile.mkdtemp(prefix = "mlem2bench")
+    for cases in args.scale:
+        fileName = os.path.join(syntheticDirectory, "synthetic-{}.txt".format(cases))
+        generateDataset(fileName, cases, args.numeric, args.symbolic, args.missing,
+                        args.decisions, args.seed)
+        fileNames.append(fileName)
+
+    flags = OrderedDict((flag, int(flag in args.flags)) for flag in mlem2.BATCHFLAGS)
+    flags["CUTPOINTSTRATEGY"] = args.cutpoints
+    flags["MAXCUTPOINTS"] = args.max_cutpoints
+    ruleTypes = list(OrderedDict.fromkeys(args.rules))
+    jobs = [(fileName, ruleTypes, flags, not args.no_memory) for fileName in fileNames]
+    records = mlem2.runBatch(jobs, max(args.jobs, 1), args.timeout, benchmarkWorker)
+
+    # Timed out or crashed jobs come back as (status, seconds) pairs
+    for index, record in enumerate(records):
+        if isinstance(record, tuple):
+            records[index] = OrderedDict(dataset = os.path.basename(fileNames[index]),
+                                         status = record[0], seconds = record[1])
+
+    for fileName in os.listdir(syntheticDirectory):
+        os.remove(os.path.join(syntheticDirectory, fileName))
+    os.rmdir(syntheticDirectory)
+
+    results = OrderedDict()
+    results["version"] = mlem2.__version__
+    results["python"] = platform.python_version()
+    results["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results["flags"] = flags
+    results["memoryTraced"] = not args.no_memory
+    if args.scale:
+        results["synthetic"] = OrderedDict(numeric = args.numeric, symbolic = args.symbolic,
+                                           missing = args.missing, decisions = args.decisions,
+                                           seed = args.seed)
+    results["runs"] = records
+
+    with open(args.output, "w") as outputFile:
+        json.dump(results, outputFile, indent = 2)
+
+    print("{:<30} {:>8} {:<10} {:>10} {:>10} {:>12}".format("Dataset", "Cases", "Status",
+                                                            "Prep (s)", "Rules (s)", "Peak (MB)"))
+    for record in records:
+        phases = record.get("phases", {})
+        induction = sum(phase["seconds"] for name, phase in phases.items()
+                        if name.startswith("mlem2."))
+        peak = max((phase.get("peakBytes", 0) for phase in phases.values()), default = 0)
+        print("{:<30} {:>8} {:<10} {:>10.2f} {:>10.2f} {:>12.1f}".format(
+            record["dataset"], record.get("cases", "-"), record["status"],
+            record.get("seconds", 0) - induction, induction, peak / (1 << 20)))
+    print("\nResults written to {}.".format(args.output))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,367 @@
+###################################################################################################
+#
+#   Program: Classification with MLEM2 Rules
+#
+#   Description: Loads a rule set induced by mlem2.py (a rule file or the Rule objects returned by
+#                mlem2.induce) and compiles it into an index. The cases of a LERS test file are
+#                classified by LERS voting: every rule matching a case votes for its decision with
+#                its strength times its specificity, and when no rule matches completely the
+#                partially matching rules vote, scaled by the fraction of their conditions met.
+#                The error rate is the fraction of test cases not classified correctly.
+#
+###################################################################################################
+
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from operator import and_
+import argparse
+import json
+import re
+import sys
+
+import mlem2
+
+# Number of test cases whose matching rules are computed together
+BATCHSIZE = 1 << 16
+
+# A rule file line holding the LERS numbers of the rule below it: specificity, strength and the
+# number of training cases it matches
+RULENUMBERS = re.compile(r"(\d+)\s*,\s*(\d+)\s*,\s*(\d+)")
+
+# A value written as a numeric interval, low..high. mlem2 writes the bounds with str(float), so
+# they may come in e-notation (1e-05..2.5e-05).
+NUMBER = r"[-+]?[0-9]+(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?"
+INTERVAL = re.compile(r"({0})\.\.({0})".format(NUMBER))
+
+# Parses a single "(attribute, value)" pair of a rule
+def parseCondition(text):
+    if not (text.startswith("(") and text.endswith(")")) or ", " not in text:
+        raise ValueError(text)
+    attribute, value = text[1:-1].split(", ", 1)
+    return attribute, value
+
+# Parses a rule in the friendly format written by mlem2. Values are kept as written; the index
+# decides which of them are also numeric intervals.
+def parseRule(text):
+    conditionText, arrow, decisionText = text.partition(" -> ")
+    if not arrow:
+        raise ValueError(text)
+
+    conditions = OrderedDict()
+    for condition in conditionText.split(" & "):
+        attribute, value = parseCondition(condition)
+        conditions[attribute] = [value]
+
+    return mlem2.Rule(conditions, parseCondition(decisionText))
+
+# Reads a rule written by mlem2 in the jsonl format. Returns the rule and its (strength, matching
+# cases) pair.
+def parseRuleRecord(text):
+    record = json.loads(text)
+    conditions = OrderedDict()
+    for attribute, value in record["conditions"]:
+        conditions[attribute] = [tuple(value) if isinstance(value, list) else value]
+
+    rule = mlem2.Rule(conditions, tuple(record["decision"]))
+    return rule, (record["strength"], record["matches"])
+
+# Parses a rule file written by mlem2, one rule per line, in any of its formats: a text rule may be
+# preceded by a line with its LERS numbers (specificity, strength, matching cases) and a JSON rule
+# carries them. Returns the rules and, for every rule, its (strength, matching cases) pair or None
+# when the file doesn't give them.
+def parseRules(fileName):
+    rules = []
+    counts = []
+    numbers = None
+
+    with open(fileName) as ruleFile:
+        for lineNumber, line in enumerate(ruleFile, 1):
+            line = line.strip()
+            if not line or line.startswith("!"):
+                continue
+
+            match = RULENUMBERS.fullmatch(line)
+            if match != None:
+                numbers = (int(match.group(2)), int(match.group(3)))
+                continue
+
+            try:
+                if line.startswith("{"):
+                    rule, numbers = parseRuleRecord(line)
+                else:
+                    rule = parseRule(line)
+            except (ValueError, KeyError, TypeError):
+                print("Error [Invalid rule file]: line {} is not a rule.\n".format(lineNumber))
+                sys.exit()
+            rules.append(rule)
+            counts.append(numbers)
+            numbers = None
+
+    return rules, counts
+
+# Returns the (low, high) interval of a rule value, or None if the value isn't an interval
+def ruleInterval(value):
+    if isinstance(value, tuple):
+        return value
+
+    match = INTERVAL.fullmatch(value)
+    if match == None:
+        return None
+    return float(match.group(1)), float(match.group(2))
+
+# Returns the value of a test case as a number, or None if it isn't numeric
+def caseNumber(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+# Builds the bisect table of a list of closed (low, high, rules) intervals: the sorted endpoints and
+# the rules satisfied in each slot, where slot 2i is the gap before endpoint i and slot 2i + 1 is
+# endpoint i itself. Each interval toggles its rules on at its first slot and off after its last.
+def intervalTable(intervals):
+    endpoints = sorted(set(bound for low, high, bits in intervals for bound in (low, high)))
+    toggles = [0] * (2 * len(endpoints) + 2)
+    for low, high, bits in intervals:
+        toggles[2 * bisect_left(endpoints, low) + 1] ^= bits
+        toggles[2 * bisect_left(endpoints, high) + 2] ^= bits
+
+    slots = []
+    running = 0
+    for toggle in toggles[:-1]:
+        running ^= toggle
+        slots.append(running)
+
+    return endpoints, slots
+
+# Returns the rules whose interval contains number, given a bisect table
+def lookupInterval(table, number):
+    endpoints, slots = table
+    index = bisect_left(endpoints, number)
+    if index < len(endpoints) and endpoints[index] == number:
+        return slots[2 * index + 1]
+    return slots[2 * index]
+
+# A rule set compiled for classification. Rules are numbered in order and any set of rules is an
+# integer bitmap (bit i stands for rule i). For every attribute tested by a rule, the index holds
+# a posting list of the rules satisfied by each symbolic value and a bisect table of the rules
+# satisfied by each range of numbers. A value written as an interval (low..high) is entered in
+# both, so discretized datasets are matched by their text and numeric ones by their numbers.
+#
+# The strength of a rule (the training cases it classifies correctly) is taken from, in order:
+# the counts given, the rule's coverage in the training dataset, or a later call to train. Rules
+# without any of them get a strength of 1.
+class RuleIndex:
+    def __init__(self, rules, counts = None, dataset = None):
+        self.rules = list(rules)
+        self.decisions = [rule.decision[1] for rule in self.rules]
+        self.specificities = [len(rule.conditions) for rule in self.rules]
+        self.strengths = [1] * len(self.rules)
+        self.matches = [None] * len(self.rules)
+        self.allRules = (1 << len(self.rules)) - 1
+
+        # Every condition goes into the posting list of its attribute and, if it is an interval,
+        # into the interval list of its attribute
+        self.postings = OrderedDict()
+        self.constrained = OrderedDict()
+        intervals = OrderedDict()
+        for number, rule in enumerate(self.rules):
+            bit = 1 << number
+            for attribute, value in rule.conditions.items():
+                text = mlem2.formatValue(value[0])
+                posting = self.postings.setdefault(attribute, {})
+                posting[text] = posting.get(text, 0) | bit
+                self.constrained[attribute] = self.constrained.get(attribute, 0) | bit
+
+                interval = ruleInterval(value[0])
+                if interval != None:
+                    intervals.setdefault(attribute, []).append(interval + (bit,))
+
+        self.tables = OrderedDict((attribute, intervalTable(attrIntervals))
+                                  for attribute, attrIntervals in intervals.items())
+
+        # Fill in the strengths that are already known
+        for number, rule in enumerate(self.rules):
+            if counts and counts[number] != None:
+                self.strengths[number], self.matches[number] = counts[number]
+            elif dataset != None and rule.coverage is not None:
+                concept = set(dataset.concepts[self.decisions[number]])
+                self.strengths[number] = sum(1 for case in rule.coverage if case in concept)
+                self.matches[number] = len(rule.coverage)
+
+    # Compiles a rule file written by mlem2
+    @classmethod
+    def fromFile(cls, fileName):
+        rules, counts = parseRules(fileName)
+        return cls(rules, counts)
+
+    def __len__(self):
+        return len(self.rules)
+
+    # Returns the rules whose condition on attribute is met by a test value. The missing values
+    # "*" and "-" meet any condition while "?" meets none.
+    def satisfied(self, attribute, value):
+        if value in ("*", "-"):
+            return self.constrained[attribute]
+        if value == "?":
+            return 0
+
+        bits = self.postings[attribute].get(value, 0)
+        if attribute in self.tables:
+            number = caseNumber(value)
+            if number != None:
+                bits |= lookupInterval(self.tables[attribute], number)
+        return bits
+
+    # Returns, for every attribute of table tested by the rules, its column of codes and the rules
+    # met by each code (computed once per distinct value), along with the rules that test an
+    # attribute the table doesn't have and so can never match
+    def compileColumns(self, table):
+        columns = []
+        for attrIndex, attribute in enumerate(table.attributes[:-1]):
+            if attribute in self.postings:
+                masks = [self.satisfied(attribute, symbol) for symbol in table.symbols(attrIndex)]
+                columns.append((attribute, table.column(attrIndex), masks))
+
+        present = set(table.attributes[:-1])
+        unmatchable = 0
+        for attribute, bits in self.constrained.items():
+            if attribute not in present:
+                unmatchable |= bits
+
+        return columns, unmatchable
+
+    # Yields, batch by batch, the rules completely matching each case of table along with the
+    # conditions met on every attribute (used for partial matching)
+    def matchBatches(self, table):
+        columns, unmatchable = self.compileColumns(table)
+        everyRule = self.allRules & ~unmatchable
+
+        for batchStart in range(0, len(table), BATCHSIZE):
+            batchEnd = min(batchStart + BATCHSIZE, len(table))
+            met = [list(map(masks.__getitem__, column[batchStart:batchEnd]))
+                   for attribute, column, masks in columns]
+
+            # A rule matches if every attribute it tests is met (it is met by default otherwise)
+            complete = [everyRule] * (batchEnd - batchStart)
+            for (attribute, column, masks), attrMet in zip(columns, met):
+                unconstrained = self.allRules & ~self.constrained[attribute]
+                complete = list(map(and_, complete,
+                                    (bits | unconstrained for bits in attrMet)))
+
+            yield batchStart, complete, met
+
+    # Sets the strength and number of matching cases of every rule from a training table. Cases are
+    # matched as test cases, so a "-" value meets any condition here (a rule's coverage only counts
+    # it for the values of its own concept).
+    def train(self, table):
+        self.strengths = [0] * len(self.rules)
+        self.matches = [0] * len(self.rules)
+        decisions = table.symbols(-1)
+        decisionColumn = table.column(-1)
+
+        for batchStart, complete, met in self.matchBatches(table):
+            for offset, bits in enumerate(complete):
+                decision = decisions[decisionColumn[batchStart + offset]]
+                for number in mlem2.BitmapBlock.fromBits(bits):
+                    self.matches[number] += 1
+                    if self.decisions[number] == decision:
+                        self.strengths[number] += 1
+
+    # Returns the decision with the largest support among the given rules, each vote scaled by its
+    # rule's matching factor (1 for complete matches). Ties go to the decision voted for first.
+    def vote(self, factors):
+        support = OrderedDict()
+        for number, factor in factors:
+            decision = self.decisions[number]
+            support[decision] = support.get(decision, 0) + \
+                factor * self.strengths[number] * self.specificities[number]
+        return max(support, key = support.get)
+
+    # Classifies every case of table. Returns a list holding, for every case, the decision chosen
+    # and how it was reached ("complete" or "partial"), or (None, None) when no rule matches it.
+    def classifyTable(self, table):
+        results = []
+
+        for batchStart, complete, met in self.matchBatches(table):
+            for offset, bits in enumerate(complete):
+                if bits:
+                    factors = ((number, 1) for number in mlem2.BitmapBlock.fromBits(bits))
+                    results.append((self.vote(factors), "complete"))
+                    continue
+
+                # Partial matching: count the conditions each rule has met for this case
+                conditionsMet = Counter()
+                for attrMet in met:
+                    conditionsMet.update(mlem2.BitmapBlock.fromBits(attrMet[offset]))
+
+                if conditionsMet:
+                    factors = ((number, count / self.specificities[number])
+                               for number, count in sorted(conditionsMet.items()))
+                    results.append((self.vote(factors), "partial"))
+                else:
+                    results.append((None, None))
+
+        return results
+
+# Classifies the cases of a LERS test file with a compiled RuleIndex. Returns the test table, the
+# classification of every case and their summary (see summarize).
+def classifyFile(index, fileName):
+    table = mlem2.parseFile([], fileName)
+    results = index.classifyTable(table)
+    return table, results, summarize(table, results)
+
+# Counts the classifications of the cases of a table. Returns an OrderedDict of counts: cases,
+# correct, incorrect, unclassified, complete and partial matches, and the error rate.
+def summarize(table, results):
+    summary = OrderedDict.fromkeys(["cases", "correct", "incorrect", "unclassified", "complete",
+                                    "partial"], 0)
+    summary["cases"] = len(table)
+    for row, (decision, how) in enumerate(results):
+        if decision == None:
+            summary["unclassified"] += 1
+            continue
+
+        summary[how] += 1
+        if decision == table.value(row, -1):
+            summary["correct"] += 1
+        else:
+            summary["incorrect"] += 1
+
+    summary["errorRate"] = 1 - summary["correct"] / len(table) if len(table) else 0.0
+    return summary
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Classify a LERS test file with MLEM2 rules.")
+    parser.add_argument("rules", help = "rule file written by mlem2.py")
+    parser.add_argument("test", help = "LERS test file to classify")
+    parser.add_argument("--train", help = "training file giving the strength of each rule")
+    parser.add_argument("--output", help = "file to write the decision chosen for every case to")
+    options = parser.parse_args(argv)
+
+    index = RuleIndex.fromFile(options.rules)
+    try:
+        if options.train:
+            index.train(mlem2.parseFile([], options.train))
+
+        table, results, summary = classifyFile(index, options.test)
+    except mlem2.DatasetError as error:
+        print("Error [Invalid dataset]: {}\n".format(error))
+        sys.exit()
+
+    if options.output:
+        with open(options.output, "w") as outputFile:
+            for row, (decision, how) in enumerate(results):
+                outputFile.write("{} {} {}\n".format(table.value(row, -1),
+                                                     "?" if decision == None else decision,
+                                                     how or "none"))
+
+    print("{} rules, {} cases: {} correct, {} incorrect, {} unclassified".format(
+        len(index), summary["cases"], summary["correct"], summary["incorrect"],
+        summary["unclassified"]))
+    print("{} complete matches, {} partial matches".format(summary["complete"],
+                                                           summary["partial"]))
+    print("Error rate: {:.2%}".format(summary["errorRate"]))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
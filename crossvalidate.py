@@ -0,0 +1,176 @@
+###################################################################################################
+#
+#   Program: MLEM2 Cross-Validation
+#
+#   Description: Estimates the error rate of the rules mlem2.py induces for a dataset by k-fold
+#                cross-validation or leave-one-out. The dataset is parsed and its blocks are built
+#                once; every fold trains on the dataset restricted to the other folds (see
+#                mlem2.Dataset.subset) and classifies its own cases with classify.py. The folds run
+#                in worker processes and the error rate and timings of every fold are reported.
+#
+###################################################################################################
+
+from collections import OrderedDict
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import classify
+import mlem2
+
+# Splits the cases of a dataset into k folds of (nearly) equal size after shuffling them with the
+# given seed. With k equal to the number of cases, every fold is a single case (leave-one-out).
+# Returns the sorted case numbers of every fold.
+def makeFolds(cases, k, seed = 0):
+    order = list(range(cases))
+    random.Random(seed).shuffle(order)
+    return [sorted(order[index::k]) for index in range(k)]
+
+# Runs a fold: induces each type of rules from the cases outside the fold and classifies the cases
+# of the fold with them. Returns the fold record, holding the summary of each rule type.
+def runFold(dataset, number, testRows, ruleTypes):
+    testCases = set(testRows)
+    trainRows = [row for row in range(dataset.cases) if row not in testCases]
+    record = OrderedDict(fold = number + 1, train = len(trainRows), test = len(testRows))
+
+    start = time.perf_counter()
+    training = dataset.subset(trainRows)
+    table = dataset.caseTable().subset(testRows)
+    record["subsetSeconds"] = time.perf_counter() - start
+
+    for ruleType in ruleTypes:
+        start = time.perf_counter()
+        rules = mlem2.induce(training, ruleType)
+        induced = time.perf_counter()
+        index = classify.RuleIndex(rules, dataset = training)
+        summary = classify.summarize(table, index.classifyTable(table))
+        summary["rules"] = len(rules)
+        summary["induceSeconds"] = induced - start
+        summary["classifySeconds"] = time.perf_counter() - induced
+        record[ruleType] = summary
+
+    record["status"] = "ok"
+    return record
+
+# Entry point of a cross-validation worker process: runs its folds of the dataset and sends back
+# their records
+def foldWorker(job, connection):
+    dataset, folds, ruleTypes, flags = job
+    vars(mlem2).update(flags)
+    records = []
+    for number, testRows in folds:
+        try:
+            records.append(runFold(dataset, number, testRows, ruleTypes))
+        except Exception as error:
+            records.append(OrderedDict(fold = number + 1,
+                                       status = "error ({})".format(type(error).__name__)))
+    connection.send(records)
+    connection.close()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Cross-validate the rules of mlem2.py.")
+    parser.add_argument("dataset", help = "LERS dataset file")
+    parser.add_argument("--folds", type = int, default = 10, help = "number of folds")
+    parser.add_argument("--loo", action = "store_true",
+                        help = "leave-one-out (as many folds as there are cases)")
+    parser.add_argument("--rules", nargs = "+", choices = ["certain", "possible"],
+                        default = ["certain", "possible"], help = "rule types to evaluate")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the fold assignment")
+    parser.add_argument("--jobs", type = int, default = os.cpu_count() or 1,
+                        help = "number of worker processes")
+    parser.add_argument("--timeout", type = float, default = 0,
+                        help = "seconds allowed per worker job (0 for no limit)")
+    parser.add_argument("--flags", nargs = "+", default = [], choices = mlem2.BATCHFLAGS,
+                        metavar = "FLAG", help = "engine flags to enable, e.g. BITMAPBLOCKS")
+    parser.add_argument("--cutpoints", choices = mlem2.CUTPOINTSTRATEGIES,
+                        default = mlem2.CUTPOINTSTRATEGY, help = "cutpoint strategy")
+    parser.add_argument("--max-cutpoints", type = int, default = mlem2.MAXCUTPOINTS,
+                        help = "cutpoints kept per numeric attribute (0 for no cap)")
+    parser.add_argument("--output", help = "JSON file for the results of every fold")
+    args = parser.parse_args(argv)
+
+    flags = OrderedDict((flag, int(flag in args.flags)) for flag in mlem2.BATCHFLAGS)
+    flags["CUTPOINTSTRATEGY"] = args.cutpoints
+    flags["MAXCUTPOINTS"] = args.max_cutpoints
+    vars(mlem2).update(flags)
+    ruleTypes = list(OrderedDict.fromkeys(args.rules))
+
+    # Parse the dataset and build its blocks once for all of the folds
+    start = time.perf_counter()
+    try:
+        dataset = mlem2.Dataset(args.dataset)
+        dataset.caseTable()
+    except mlem2.DatasetError as error:
+        print("Error [Invalid dataset]: {}\n".format(error))
+        sys.exit()
+    preprocessSeconds = time.perf_counter() - start
+
+    k = dataset.cases if args.loo else args.folds
+    if not 2 <= k <= dataset.cases:
+        print("Error [Invalid folds]: {} folds for {} cases.\n".format(k, dataset.cases))
+        sys.exit()
+    folds = list(enumerate(makeFolds(dataset.cases, k, args.seed)))
+
+    # A few jobs per worker keep them busy without starting a process per fold
+    workers = max(args.jobs, 1)
+    jobCount = min(len(folds), workers * 4)
+    jobs = [(dataset, folds[index::jobCount], ruleTypes, flags) for index in range(jobCount)]
+    start = time.perf_counter()
+    results = mlem2.runBatch(jobs, workers, args.timeout, foldWorker)
+    seconds = time.perf_counter() - start
+
+    # Timed out or crashed jobs come back as (status, seconds) pairs
+    records = []
+    for job, result in zip(jobs, results):
+        if isinstance(result, tuple):
+            result = [OrderedDict(fold = number + 1, status = result[0])
+                      for number, testRows in job[1]]
+        records.extend(result)
+    records.sort(key = lambda record: record["fold"])
+
+    print("{:>6} {:>7} {:>6} {:<10}".format("Fold", "Train", "Test", "Status") +
+          "".join(" {:>17} {:>7} {:>9}".format(ruleType.capitalize() + " error", "Rules",
+                                               "Time (s)") for ruleType in ruleTypes))
+    for record in records:
+        line = "{:>6} {:>7} {:>6} {:<10}".format(record["fold"], record.get("train", "-"),
+                                                 record.get("test", "-"), record["status"])
+        for ruleType in ruleTypes:
+            if ruleType in record:
+                summary = record[ruleType]
+                line += " {:>16.2f}% {:>7} {:>9.2f}".format(
+                    summary["errorRate"] * 100, summary["rules"],
+                    summary["induceSeconds"] + summary["classifySeconds"])
+        print(line)
+
+    finished = [record for record in records if record["status"] == "ok"]
+    print()
+    means = OrderedDict()
+    for ruleType in ruleTypes:
+        rates = [record[ruleType]["errorRate"] for record in finished]
+        means[ruleType] = sum(rates) / len(rates) if rates else None
+        if rates:
+            print("Mean {} error rate: {:.2%} over {} folds".format(ruleType, means[ruleType],
+                                                                      len(rates)))
+    print("Preprocessed once in {:.2f}s, {} folds finished in {:.2f}s on {} workers.".format(
+        preprocessSeconds, len(finished), seconds, workers))
+
+    if args.output:
+        results = OrderedDict()
+        results["version"] = mlem2.__version__
+        results["dataset"] = os.path.basename(args.dataset)
+        results["cases"] = dataset.cases
+        results["folds"] = k
+        results["seed"] = args.seed
+        results["flags"] = flags
+        results["preprocessSeconds"] = preprocessSeconds
+        results["seconds"] = seconds
+        results["meanErrorRate"] = means
+        results["runs"] = records
+        with open(args.output, "w") as outputFile:
+            json.dump(results, outputFile, indent = 2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -13,22 +13,641 @@
 #
 ###################################################################################################
 
-from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+from copy import copy
+from array import array
+from heapq import heapify, heappop, heappush
+from itertools import accumulate, chain, islice
+from multiprocessing.connection import wait
+import argparse
+import cProfile
+import glob
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import pstats
 import re
 import sys
+import threading
 import time
+import tracemalloc
 
+__version__ = "1.1"
+
+# Settings of the interactive program (the library functions below don't depend on them)
 __inputFile__ = None
 __inputFileName__ = ""
 __outputFile__ = None
 __outputFileName__ = ""
 __calcCertain__ = False
-__incompleteDataset__ = False
+
+# State shared with the workers of a parallel induction (the block table) or preprocessing (the
+# universe), set in each worker process when the pool starts
+__parallelState__ = None
+
+# Instrumentation collecting the timings and counters of the run (see startInstrumentation)
+__instrumentation__ = None
+
+# Library calls running in every thread of the process (see libraryCall)
+__libraryCalls__ = Counter()
+__libraryLock__ = threading.Lock()
 
 # Output flags --> set to 1 if output is desired
 FASTRULES = 0
 STATUSINFO = 0
 
+# Rule output settings. RULEFORMAT is one of RULEFORMATS: "text" writes one rule per line, "lers"
+# puts the LERS numbers of each rule (specificity, strength, matching cases) on the line above it
+# and "jsonl" writes every rule as a JSON object on its own line.
+RULEFORMAT = "text"
+RULEFORMATS = ["text", "lers", "jsonl"]
+WRITEBUFFER = 1 << 16
+
+# Engine flags --> set to 1 to enable
+BITMAPBLOCKS = 0    # Store attribute-value blocks as packed bitmaps instead of Python sets
+INCREMENTALSEARCH = 0   # Keep per-block goal counts between calls instead of rescanning blocks
+PREPROCESSCACHE = 0 # Reuse the preprocessed dataset from CACHEDIRECTORY when the file is unchanged
+PARALLELCONCEPTS = 0    # Induce the rules of each concept in a separate worker process
+PARALLELBLOCKS = 0  # Build the blocks of the attributes on a pool of worker processes
+REUSERULES = 0      # Reuse certain rules as possible rules for concepts with equal approximations
+REDUNDANTRULES = 0  # Drop the rules whose goal cases are all covered by other rules of the concept
+INTERVALCACHE = 0   # Keep merged intervals in an IntervalCache instead of adding them to the table
+LAZYBLOCKS = 0      # Keep numeric blocks as ranges of the sorted values until their cases are used
+COLLAPSEDUPLICATES = 0  # Induce over one weighted representative of every group of duplicate cases
+
+# Cutpoint settings of numeric attributes. CUTPOINTSTRATEGY is one of CUTPOINTSTRATEGIES:
+#   "all"       a cutpoint between every two adjacent values (the all cutpoints approach)
+#   "boundary"  only the cutpoints between adjacent values whose cases don't all share a decision
+#   "frequency" FREQUENCYBINS - 1 cutpoints splitting the cases into intervals of equal frequency
+# MAXCUTPOINTS caps the cutpoints of each attribute (0 for no cap): when a strategy gives more, the
+# ones closest to an equal-frequency split are kept. Anything but "all" without a cap can change
+# the rules induced.
+CUTPOINTSTRATEGY = "all"
+CUTPOINTSTRATEGIES = ["all", "boundary", "frequency"]
+MAXCUTPOINTS = 0
+FREQUENCYBINS = 10
+
+# Number of merged interval blocks an IntervalCache holds
+INTERVALCACHESIZE = 1024
+
+# Number of blocks of a lazy numeric attribute (see RankedColumn) kept built at a time
+LAZYBLOCKCACHESIZE = 64
+
+# Resumable runs (see InductionRun): seconds between two checkpoints of a run (0 for none) and the
+# seconds a run may take before it stops with the rules found so far (0 for no limit)
+CHECKPOINTINTERVAL = 0
+TIMEBUDGET = 0
+
+# Preprocessing cache settings
+CACHEDIRECTORY = ".mlem2cache"
+CACHEMAXBYTES = 512 << 20
+CACHEMAGIC = b"MLEM2CACHE\x01"
+
+# Instrumentation settings
+PROGRESSINTERVAL = 0.5  # Seconds between two progress reports of a concept
+PROFILEENTRIES = 25     # Functions kept in the cProfile summary of a phase
+
+# Timings, counters and optional profiles of a run, exported as JSON. Phases are timed with the
+# phase() context (a phase run several times adds up) and may capture the peak memory allocated
+# (profile = "tracemalloc") or a cProfile summary (profile = "cprofile"). The counters are:
+#   candidates      blocks evaluated while searching for the largest intersection
+#   pruned          blocks the search skipped because they couldn't beat the best one
+#   intersections   block intersections performed while searching and building rules
+#   dropped         conditions dropped by dropConditions
+#   redundantRules  rules dropped by dropRedundantRules
+#   intervalHits    merged intervals found in the IntervalCache (intervalMisses: rebuilt)
+#   blocksBuilt     cases of lazy numeric blocks built by their RankedColumn
+#   duplicates      cases collapsed into a representative of their duplicates (see CaseWeights)
+#   rules           rules induced (rulesPerConcept has them by concept)
+# Rule induction progress goes to the progress callback as (decision, completed, total, eta).
+# Counts made in the worker processes of PARALLELCONCEPTS and PARALLELBLOCKS are not collected.
+# There is one instrumentation for the whole process and it is single-threaded: it can't start
+# while another thread is in the library, and while it is on only one thread at a time can be.
+class Instrumentation:
+    def __init__(self, profile = None, progress = None, interval = PROGRESSINTERVAL):
+        if profile not in (None, "tracemalloc", "cprofile"):
+            raise ValueError("unknown profile: {}".format(profile))
+        self.profile = profile
+        self.progressCallback = progress
+        self.interval = interval
+        self.phases = OrderedDict()
+        self.counters = Counter()
+        self.rulesPerConcept = OrderedDict()
+        self.profiles = OrderedDict()
+        self.depth = 0
+
+    # Times the body of a with statement as the named phase. Only the outermost phase of nested
+    # phases is profiled.
+    @contextmanager
+    def phase(self, name):
+        profiler = None
+        tracing = False
+        if self.depth == 0 and self.profile == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif self.depth == 0 and self.profile == "tracemalloc":
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            self.depth -= 1
+
+            entry = self.phases.setdefault(name, OrderedDict(seconds = 0.0, calls = 0))
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+            if profiler:
+                profiler.disable()
+                self.profiles[name] = profileSummary(profiler)
+            elif self.depth == 0 and self.profile == "tracemalloc":
+                peak = tracemalloc.get_traced_memory()[1] - before
+                entry["peakBytes"] = max(entry.get("peakBytes", 0), peak)
+                if tracing:
+                    tracemalloc.stop()
+
+    def count(self, name, amount = 1):
+        self.counters[name] += amount
+
+    # Records the rules induced for a concept
+    def conceptRules(self, decision, ruleCount):
+        self.rulesPerConcept[str(decision)] = ruleCount
+        self.counters["rules"] += ruleCount
+
+    def report(self):
+        report = OrderedDict()
+        report["phases"] = self.phases
+        report["counters"] = OrderedDict(sorted(self.counters.items()))
+        report["rulesPerConcept"] = self.rulesPerConcept
+        if self.profiles:
+            report["profiles"] = self.profiles
+        return report
+
+    def save(self, fileName):
+        with open(fileName, "w") as outputFile:
+            json.dump(self.report(), outputFile, indent = 2)
+
+# Summarizes a cProfile run: the PROFILEENTRIES functions with the most cumulative time
+def profileSummary(profiler):
+    stats = pstats.Stats(profiler, stream = io.StringIO())
+    summary = []
+    for (fileName, line, function), (primitive, calls, total, cumulative, callers) in \
+            sorted(stats.stats.items(), key = lambda item: -item[1][3])[:PROFILEENTRIES]:
+        summary.append(OrderedDict([("function", "{}:{}({})".format(os.path.basename(fileName),
+                                                                     line, function)),
+                                    ("calls", calls), ("totalSeconds", total),
+                                    ("cumulativeSeconds", cumulative)]))
+    return summary
+
+# Turns instrumentation on for the rest of the run (or until stopInstrumentation) and returns it.
+# Raises RuntimeError if another thread is in the library.
+def startInstrumentation(profile = None, progress = None, interval = PROGRESSINTERVAL):
+    global __instrumentation__
+    with __libraryLock__:
+        if otherLibraryCalls():
+            raise RuntimeError("instrumentation can't start while another thread is in the library")
+        __instrumentation__ = Instrumentation(profile, progress, interval)
+    return __instrumentation__
+
+# Turns instrumentation off and returns what it collected
+def stopInstrumentation():
+    global __instrumentation__
+    instrumentation = __instrumentation__
+    __instrumentation__ = None
+    return instrumentation
+
+# Returns the number of library calls running in threads other than this one. The caller holds
+# __libraryLock__.
+def otherLibraryCalls():
+    thread = threading.get_ident()
+    return sum(count for ident, count in __libraryCalls__.items() if ident != thread)
+
+# Context of a call into the library (building a Dataset, inducing its rules). Calls nest within a
+# thread, but with instrumentation on, one can't start while another thread is in the library
+# (RuntimeError), since the phases and counters of the instrumentation are shared by the process.
+@contextmanager
+def libraryCall():
+    thread = threading.get_ident()
+    with __libraryLock__:
+        if __instrumentation__ and otherLibraryCalls():
+            raise RuntimeError("instrumented library calls can't run in several threads at once")
+        __libraryCalls__[thread] += 1
+    try:
+        yield
+    finally:
+        with __libraryLock__:
+            __libraryCalls__[thread] -= 1
+            if not __libraryCalls__[thread]:
+                del __libraryCalls__[thread]
+
+# Returns a context timing the named phase when instrumentation is on
+def phase(name):
+    if __instrumentation__:
+        return __instrumentation__.phase(name)
+    return nullcontext()
+
+# Reports the progress of the rules of one concept: how many cases of its goal are covered so far.
+# Reports are at least `interval` seconds apart (except the last one) and come with an estimate of
+# the seconds left, based on the rate so far.
+class ProgressReporter:
+    def __init__(self, callback, decision, total, interval = PROGRESSINTERVAL):
+        self.callback = callback
+        self.decision = decision
+        self.total = total
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.lastReport = None
+
+    def update(self, completed):
+        now = time.perf_counter()
+        if (completed < self.total and self.lastReport is not None and
+                now - self.lastReport < self.interval):
+            return
+        self.lastReport = now
+
+        eta = (now - self.start) / completed * (self.total - completed) if completed else None
+        self.callback(self.decision, completed, self.total, eta)
+
+# Returns the progress reporter of a concept: the instrumentation's callback if there is one,
+# otherwise the goalStatus bar when STATUSINFO is set (or None if progress isn't wanted)
+def progressReporter(decision, total):
+    if __instrumentation__ and __instrumentation__.progressCallback:
+        return ProgressReporter(__instrumentation__.progressCallback, decision, total,
+                                __instrumentation__.interval)
+    if STATUSINFO:
+        return ProgressReporter(goalStatus, decision, total)
+    return None
+
+# A set of case numbers stored as a packed bitmap (bit i is set when case i is in the block).
+# Implements the part of the set interface used during preprocessing and rule induction, so the
+# functions below work the same no matter which block backend was selected. Intersections, subset
+# tests and cardinality become a single AND/popcount over the underlying integer.
+class BitmapBlock:
+    __slots__ = ("bits",)
+
+    def __init__(self, cases = ()):
+        if isinstance(cases, BitmapBlock):
+            self.bits = cases.bits
+        else:
+            self.bits = bitsFromCases(cases)
+
+    # Builds a block directly from an integer bitmap
+    @classmethod
+    def fromBits(cls, bits):
+        block = cls.__new__(cls)
+        block.bits = bits
+        return block
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __contains__(self, case):
+        return (self.bits >> case) & 1 == 1
+
+    def __iter__(self):
+        # Walk the binary representation from the least significant bit
+        binary = bin(self.bits)[:1:-1]
+        index = binary.find("1")
+        while index != -1:
+            yield index
+            index = binary.find("1", index + 1)
+
+    def __eq__(self, other):
+        if isinstance(other, BitmapBlock):
+            return self.bits == other.bits
+        return set(self) == set(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{" + ", ".join(str(case) for case in self) + "}" if self.bits else "set()"
+
+    def __and__(self, other):
+        return BitmapBlock.fromBits(self.bits & toBits(other))
+
+    def __or__(self, other):
+        return BitmapBlock.fromBits(self.bits | toBits(other))
+
+    def __sub__(self, other):
+        return BitmapBlock.fromBits(self.bits & ~toBits(other))
+
+    def intersection(self, *others):
+        bits = self.bits
+        for other in others:
+            bits &= toBits(other)
+        return BitmapBlock.fromBits(bits)
+
+    def union(self, *others):
+        bits = self.bits
+        for other in others:
+            bits |= toBits(other)
+        return BitmapBlock.fromBits(bits)
+
+    def difference(self, *others):
+        bits = self.bits
+        for other in others:
+            bits &= ~toBits(other)
+        return BitmapBlock.fromBits(bits)
+
+    def issubset(self, other):
+        return self.bits & ~toBits(other) == 0
+
+    def isdisjoint(self, other):
+        return self.bits & toBits(other) == 0
+
+    def add(self, case):
+        self.bits |= 1 << case
+
+    def update(self, *others):
+        for other in others:
+            self.bits |= toBits(other)
+
+# Packs an iterable of case numbers into an integer bitmap
+def bitsFromCases(cases):
+    cases = list(cases)
+    if not cases:
+        return 0
+
+    packed = bytearray((max(cases) >> 3) + 1)
+    for case in cases:
+        packed[case >> 3] |= 1 << (case & 7)
+    return int.from_bytes(packed, "little")
+
+# Returns the integer bitmap for any block type
+def toBits(block):
+    if isinstance(block, RangeBlock):
+        block = block.cases()
+    if isinstance(block, BitmapBlock):
+        return block.bits
+    return bitsFromCases(block)
+
+# Creates a new block holding the given cases using the selected block backend
+def newBlock(cases = ()):
+    if BITMAPBLOCKS:
+        return BitmapBlock(cases)
+    return set(cases)
+
+# The rows of a numeric attribute without missing values, ranked by value (see
+# rankNumericAttribute), and the position of every case in the ranking (ranks, -1 for cases left
+# out). The blocks of a lazy attribute are ranges of the ranking (see RangeBlock); the column
+# builds their cases with the selected backend when they are needed and keeps the last `size` of
+# them, evicting the least recently used first. The goal last intersected with the column's blocks
+# is kept ranked, so every block of the attribute is intersected with it by two binary searches.
+class RankedColumn:
+    def __init__(self, rows, caseCount, size = None):
+        self.rows = array("i", rows)
+        self.ranks = array("i", [-1]) * caseCount
+        for position, row in enumerate(self.rows):
+            self.ranks[row] = position
+        self.size = size or LAZYBLOCKCACHESIZE
+        self.setup()
+
+    # Empties the cache of built blocks and the ranked goal
+    def setup(self):
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.ranked = (None, [], [])
+
+    # Only the ranking is pickled (blocks of a column reach the parent of a worker process)
+    def __getstate__(self):
+        return self.rows, self.ranks, self.size
+
+    def __setstate__(self, state):
+        self.rows, self.ranks, self.size = state
+        self.setup()
+
+    # Returns the position of a case in the ranking (-1 if it isn't in it)
+    def rank(self, case):
+        return self.ranks[case] if 0 <= case < len(self.ranks) else -1
+
+    # Returns the cases at positions [start, end) of the ranking
+    def block(self, start, end):
+        key = (start, end)
+        with self.lock:
+            if key in self.blocks:
+                self.blocks.move_to_end(key)
+                return self.blocks[key]
+
+        block = newBlock(self.rows[start:end])
+        if __instrumentation__:
+            __instrumentation__.count("blocksBuilt")
+        with self.lock:
+            self.blocks[key] = block
+            while len(self.blocks) > self.size:
+                self.blocks.popitem(last = False)
+        return block
+
+    # Returns the rows of goal sorted by rank, along with their ranks
+    def rankGoal(self, goal):
+        ranked = self.ranked
+        if ranked[0] is not goal:
+            rows = sorted(goal, key = self.ranks.__getitem__)
+            ranked = (goal, rows, [self.ranks[row] for row in rows])
+            self.ranked = ranked
+        return ranked[1], ranked[2]
+
+    # Returns the cases of goal at positions [start, end) of the ranking
+    def goalCases(self, goal, start, end):
+        rows, positions = self.rankGoal(goal)
+        return newBlock(rows[bisect_left(positions, start):bisect_left(positions, end)])
+
+    # Returns the number of cases of goal at positions [start, end) of the ranking
+    def goalCount(self, goal, start, end):
+        rows, positions = self.rankGoal(goal)
+        return bisect_left(positions, end) - bisect_left(positions, start)
+
+    # Returns the column of the cases in mask, ranked in the same order, along with the position in
+    # it of every position of this column (up to the end of the ranking)
+    def subset(self, mask):
+        column = RankedColumn([row for row in self.rows if row in mask], len(self.ranks),
+                              self.size)
+        positions = [0] + list(accumulate(map(mask.__contains__, self.rows)))
+        return column, positions
+
+# A block of a lazy numeric attribute: the cases at positions [start, end) of the attribute's
+# RankedColumn. Its size, membership and intersection with a goal come from the ranking, the
+# intersection with a block of the same column is a range too, and any other operation works on
+# the cases the column builds for it, so it can stand in for a block of either backend. Like every
+# block of the table, it is never changed in place.
+class RangeBlock:
+    __slots__ = ("column", "start", "end")
+
+    def __init__(self, column, start, end):
+        self.column = column
+        self.start = start
+        self.end = max(start, end)
+
+    # Returns the cases of the block
+    def cases(self):
+        return self.column.block(self.start, self.end)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __bool__(self):
+        return self.end > self.start
+
+    def __contains__(self, case):
+        return self.start <= self.column.rank(case) < self.end
+
+    def __iter__(self):
+        return iter(self.column.rows[self.start:self.end])
+
+    def __eq__(self, other):
+        if isinstance(other, RangeBlock) and other.column is self.column:
+            return len(self) == len(other) and (not self or self.start == other.start)
+        return self.cases() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.cases())
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    __rand__ = __and__
+
+    def __or__(self, other):
+        return self.cases() | other
+
+    __ror__ = __or__
+
+    def __sub__(self, other):
+        return self.cases() - other
+
+    def __rsub__(self, other):
+        return other - self.cases()
+
+    def intersection(self, *others):
+        if len(others) == 1 and isinstance(others[0], RangeBlock):
+            other = others[0]
+            if other.column is self.column:
+                return RangeBlock(self.column, max(self.start, other.start),
+                                  min(self.end, other.end))
+        elif len(others) == 1:
+            return self.column.goalCases(others[0], self.start, self.end)
+        return self.cases().intersection(*others)
+
+    def union(self, *others):
+        return self.cases().union(*others)
+
+    def difference(self, *others):
+        return self.cases().difference(*others)
+
+    def issubset(self, other):
+        return self.cases().issubset(other)
+
+    def isdisjoint(self, other):
+        return self.cases().isdisjoint(other)
+
+# Number of characters read from the input file at a time while parsing
+CHUNKSIZE = 1 << 20
+
+# Column codes of the missing values (lost, don't care and attribute-concept). Specified values are
+# numbered from 0 in order of first appearance.
+LOSTVALUE = -1
+DONTCAREVALUE = -2
+ATTRCONCEPTVALUE = -3
+MISSINGCODES = {'?': LOSTVALUE, '*': DONTCAREVALUE, '-': ATTRCONCEPTVALUE}
+
+# Dictionary encoding the values of a single attribute. Looking up a value never seen before gives
+# it the next free code and records it in values, so a whole column can be encoded with map().
+class ValueDictionary(dict):
+    def __init__(self):
+        super().__init__(MISSINGCODES)
+        self.values = []
+
+    def __missing__(self, value):
+        code = len(self.values)
+        self.values.append(value)
+        self[value] = code
+        return code
+
+# The universe of cases stored by column. Each attribute (the decision is the last one) is an array
+# of integer codes into the attribute's value dictionary, with the negative codes above for missing
+# values. Numeric attributes can also be read as a column of floats, parsed once per distinct value.
+class CaseTable:
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self.dictionaries = [ValueDictionary() for attribute in attributes]
+        self.columns = [array("i") for attribute in attributes]
+        self.numericColumns = {}
+        self.tokenCount = 0
+        self.incomplete = False
+
+    # Appends a run of data tokens (cases written one after another) to the columns
+    def appendTokens(self, tokens):
+        width = len(self.columns)
+        for attrIndex in range(width):
+            start = (attrIndex - self.tokenCount) % width
+            encode = self.dictionaries[attrIndex].__getitem__
+            self.columns[attrIndex].extend(map(encode, tokens[start::width]))
+        self.tokenCount += len(tokens)
+
+    def __len__(self):
+        return len(self.columns[-1]) if self.columns else 0
+
+    # Returns the integer codes of the attribute at attrIndex
+    def column(self, attrIndex):
+        return self.columns[attrIndex]
+
+    # Returns the specified values of the attribute at attrIndex, indexed by their codes
+    def dictionary(self, attrIndex):
+        return self.dictionaries[attrIndex].values
+
+    # Returns a list that turns any code of the attribute at attrIndex back into its text (the
+    # negative missing value codes index the symbols appended to the end)
+    def symbols(self, attrIndex):
+        return self.dictionaries[attrIndex].values + ['-', '*', '?']
+
+    # Returns the attribute at attrIndex as floats (NaN for missing values)
+    def numericColumn(self, attrIndex):
+        if attrIndex not in self.numericColumns:
+            numbers = [float(value) for value in self.dictionary(attrIndex)] + [float("nan")] * 3
+            self.numericColumns[attrIndex] = array("d", map(numbers.__getitem__,
+                                                            self.columns[attrIndex]))
+        return self.numericColumns[attrIndex]
+
+    # Returns the text of a single value
+    def value(self, row, attrIndex):
+        code = self.columns[attrIndex][row]
+        return self.dictionaries[attrIndex].values[code] if code >= 0 else "-*?"[code]
+
+    # Rows can still be read as lists of values
+    def __getitem__(self, row):
+        return [self.value(row, attrIndex) for attrIndex in range(len(self.columns))]
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    # A dataset is incomplete if any of its values (decision included) is missing
+    def isIncomplete(self):
+        return any(column and min(column) < 0 for column in self.columns)
+
+    # Returns a new table holding the given rows, in order (numbered from 0)
+    def subset(self, rows):
+        table = CaseTable(self.attributes)
+        table.appendTokens([token for row in rows for token in self[row]])
+        table.incomplete = table.isIncomplete()
+        return table
+
 # Prints out an enumerable object token by token, separating tokens with a newline.
 # Will print lines with link numbers starting at 0 if PRINT_LINE_NUMBERS is True
 def listPrint(lst):
@@ -63,64 +682,79 @@ def userInput():
     global __outputFileName__
     __outputFileName__ = checkFile(input("What is the name of the output file?\t\t"), "w")
 
-# Parses the input file and stores all relevant information for parsing.
-# Modifies the array of cases to include the universe of cases
-#   Each case has a list of indicies to a dictionary key which specifies the value of the attribute
-# Modifies the dictionary of attributes to include all attributes values seen
-def parseFile(attributes):
-    global __incompleteDataset__
-
-    inputFile = open(__inputFileName__)
+# Raised for an invalid dataset file, with what is wrong with it as the message. The interactive
+# and batch programs print it as an "Error [Invalid dataset]" line.
+class DatasetError(ValueError):
+    pass
 
+# Parses the input file and stores all relevant information for parsing.
+# The file is streamed in chunks of CHUNKSIZE characters and the cases are stored by column in a
+# CaseTable, which is returned as the universe of cases
+# Modifies the list of attributes to include all attribute names (the decision name is last)
+# Raises a DatasetError if the file is not a valid dataset
+def parseFile(attributes, fileName):
     # Parse the input file to generate the universe of cases
     skipInput = True
     readAttrs = False
-    universe = []
-    currentCase = []
-    attr = 0
+    universe = None
+    remainder = ""
 
-    # Skip the < a ... a d > descriptors, read in attribute names/decision name
-    for line in inputFile:
-        tokens = line.split()
-
-        for token in tokens:
-            # If a comment is encountered, skip the rest of the line
-            if token == '!':
+    with open(fileName, buffering = CHUNKSIZE) as inputFile:
+        while True:
+            chunk = inputFile.read(CHUNKSIZE)
+            lines = (remainder + chunk).split("\n")
+            # Keep a partially read line for the next chunk
+            remainder = lines.pop() if chunk else ""
+            dataTokens = []
+
+            # Skip the < a ... a d > descriptors, read in attribute names/decision name
+            for line in lines:
+                tokens = line.split()
+
+                # If a comment is encountered, skip the rest of the line
+                if '!' in tokens:
+                    tokens = tokens[:tokens.index('!')]
+
+                # Lines of cases can be taken whole
+                if not skipInput and not readAttrs and ">" not in tokens:
+                    dataTokens.extend(tokens)
+                    continue
+
+                for token in tokens:
+                    # Adjust flags to now accept attribute names
+                    if token == ">":
+                        skipInput = False
+                        readAttrs = True
+                    elif not skipInput and readAttrs:
+                        # Store all of the attribute names in a list
+                        if token == ']':
+                            readAttrs = False
+                        elif token != '[':
+                            if token not in attributes:
+                                attributes.append(token)
+                            else:
+                                # Duplicate token, invalid dataset.
+                                raise DatasetError("Token already recognized.")
+                    elif not skipInput and not readAttrs:
+                        dataTokens.append(token)
+
+            if dataTokens:
+                if universe is None:
+                    universe = CaseTable(attributes)
+                universe.appendTokens(dataTokens)
+
+            if not chunk:
                 break
-            # Adjust flags to now accept attribute names
-            elif token == ">":
-                skipInput = False
-                readAttrs = True
-            elif not skipInput and readAttrs:
-                # Store all of the attribute names in a list
-                if token == ']':
-                    readAttrs = False
-                elif token != '[':
-                    if token not in attributes:
-                        attributes.append(token)
-                    else:
-                        # Duplicate token, invalid dataset.
-                        print("Error [Invalid dataset]: Token already recognized.\n")
-                        sys.exit()
-            elif not skipInput and not readAttrs:
-                # Check here if there are any missing attributes (must check all tokens)
-                if not __incompleteDataset__ and (token == '?' or token == '*' or token == '-'):
-                    __incompleteDataset__ = True
-
-                if attr >= len(attributes):
-                    # Finished a case, reset attribute counter and append this list to the universe
-                    attr = 0
-                    universe.append(currentCase)
-                    currentCase = []
-
-                currentCase.append(token)
-                attr += 1
-    # Append the last currentCase (last line)
-    universe.append(currentCase)
+
+    if universe is None or universe.tokenCount % len(attributes) != 0:
+        raise DatasetError("Incomplete case.")
+
+    # Check here if there are any missing attribute values
+    universe.incomplete = universe.isIncomplete()
 
     if STATUSINFO:
         print("Input file parsed. There are {} total cases.".format(len(universe)))
-        if __incompleteDataset__:
+        if universe.incomplete:
             print("  **This dataset is incomplete; using concept approximations.\n")
 
     return universe
@@ -165,39 +799,20 @@ def calculateOtherSet():
 # Determine what type each attribute belongs to
 # Type 1: Symbolic
 # Type 2: Numeric
-# Type 3: Missing (A type 3 attribute confirms invalid input and exits the program)
-# Returns a list of the attribute types
-def attributeTypes(universe, attributes):
-    types = []
-
-    decimal = "-?[0-9]+(\.[0-9]+)?"
-    type1 = 0
-    type2 = 0
-
+# Type 3: Missing (A type 3 attribute confirms invalid input and raises a DatasetError)
+# Returns a list of the attribute types. Given a worker pool (see blockPool), the attributes are
+# typed by its workers.
+def attributeTypes(universe, attributes, pool = None):
     # For every attribute, find its type
-    for i in range(0, len(attributes) - 1):
-        case = 0
-
-        # Cycle through this attribute in each case until a valid type is found
-        while True:
-            attr = universe[case][i]
-
-            # Matches a symbolic type
-            match = re.fullmatch(decimal + "\.\." + decimal + "|[A-Za-z]+", attr)
-            if match != None:
-                types.append(1)
-                type1 += 1
-                break
-            match = re.fullmatch(decimal, attr)
-            if match != None:
-                types.append(2)
-                type2 += 1
-                break
+    if pool:
+        types = pool.map(attributeTypeWorker, range(len(attributes) - 1))
+    else:
+        types = [attributeType(universe.dictionary(i)) for i in range(0, len(attributes) - 1)]
 
-            case += 1
-            if case == len(universe):
-                print("Error [Invalid dataset]: type 3 attribute.\n")
-                sys.exit()
+    if 3 in types:
+        raise DatasetError("type 3 attribute.")
+    type1 = types.count(1)
+    type2 = types.count(2)
 
     if STATUSINFO:
         print("Attribute types evaluated. There are {} attributes.".format(len(attributes) - 1))
@@ -205,22 +820,40 @@ def attributeTypes(universe, attributes):
 
     return types
 
+# Returns the type of an attribute given its distinct values
+def attributeType(values):
+    decimal = "-?[0-9]+(\.[0-9]+)?"
+
+    # Cycle through the distinct values (in order of appearance) until a valid type is found
+    for attr in values:
+        # Matches a symbolic type
+        match = re.fullmatch(decimal + "\.\." + decimal + "|[A-Za-z]+", attr)
+        if match != None:
+            return 1
+        match = re.fullmatch(decimal, attr)
+        if match != None:
+            return 2
+    return 3
+
+# Runs in a worker process of blockPool and returns the type of the attribute at attrIndex
+def attributeTypeWorker(attrIndex):
+    universe, concepts = __parallelState__
+    return attributeType(universe.dictionary(attrIndex))
+
 # Computes the concepts for the given universe (sets of distinct cases with the same decision)
 def calculateConcepts(universe):
     concepts = OrderedDict()
 
-    # For every case in the universe, add the case number to the concept set it belongs
-    for index, case in enumerate(universe):
-        decision = case[-1]
+    # For every case in the universe, add the case number to the concept it belongs (cases are
+    # visited in order, so each concept comes out sorted)
+    decisions = universe.symbols(-1)
+    for index, code in enumerate(universe.column(-1)):
+        decision = decisions[code]
 
         if decision in concepts:
-            concepts[decision].add(index)
+            concepts[decision].append(index)
         else:
-            concepts[decision] = set([index])
-
-    # For simplicity, sort each concept
-    for key, value in concepts.items():
-        concepts[key] = sorted(value, key = int)
+            concepts[decision] = [index]
 
     return concepts
 
@@ -228,182 +861,476 @@ def calculateConcepts(universe):
 # is not lost, don't care, or "-", add it to the list of specified values.
 def calculateValuesSpecified(universe, attrIndex, concept):
     valuesSpecified = set()
+    codes = universe.column(attrIndex)
+    values = universe.dictionary(attrIndex)
 
     # For each case in the concept, add its value to the list if it is specified
     for case in concept:
-        value = universe[case][attrIndex]
-        if value != '-' and value != '?' and value != '*':
-            valuesSpecified.add(value)
+        code = codes[case]
+        if code >= 0:
+            valuesSpecified.add(values[code])
 
     return valuesSpecified
 
-# Calculates the cutpoints of the numeric attribute at attribute index attrIndex of the universe
+# Looks up the entry for the given attribute and concept in the index of specified values, scanning
+# the concept only the first time the pair is asked for. Each entry holds the "values" specified in
+# the concept and the union of their blocks ("block"), which calculateCSets fills in when needed.
+def specifiedEntry(universe, attrIndex, concepts, decision, specifiedIndex):
+    key = (attrIndex, decision)
+    if key not in specifiedIndex:
+        entry = OrderedDict()
+        entry["values"] = calculateValuesSpecified(universe, attrIndex, concepts[decision])
+        entry["block"] = None
+        specifiedIndex[key] = entry
+    return specifiedIndex[key]
+
+# Converts the specified values of the numeric attribute at attrIndex to floats once and ranks
+# them. Returns the specified rows sorted by value along with their values, so every [low, cutpoint]
+# block is a prefix and every [cutpoint, high] block is a suffix of the sorted rows.
+def rankNumericAttribute(universe, attrIndex):
+    codes = universe.column(attrIndex)
+    numbers = universe.numericColumn(attrIndex)
+
+    # Sorting is stable, so rows with equal values stay in row order
+    rows = [row for row, code in enumerate(codes) if code >= 0]
+    rows.sort(key = numbers.__getitem__)
+
+    column = OrderedDict()
+    column["rows"] = rows
+    column["values"] = [numbers[row] for row in rows]
+    return column
+
+# Calculates the cutpoints of a ranked numeric attribute (see rankNumericAttribute) following
+# CUTPOINTSTRATEGY and MAXCUTPOINTS. decisions holds the decision code of every row (only the
+# boundary strategy needs it).
 # Returns a list of pairs: index 0 is the lower bound, index 1 is the upper bound of the interval
-def calculateCutpointAttrValuePairs(universe, attrIndex):
-    values = set()
-
-    # First, store all distinct values and sort them
-    for row, case in enumerate(universe):
-        value = case[attrIndex]
-        if value != '-' and value != '?' and value != '*':
-            values.add(float(value))
-
-    # Sort the set of values (at the same time, convert to list)
-    values = sorted(values, key = float)
+def calculateCutpointAttrValuePairs(column, decisions = None):
+    # The distinct values are the changes along the sorted values
+    values = column["values"]
+    starts = [index for index in range(len(values))
+              if index == 0 or values[index] != values[index - 1]]
+    distinct = [values[start] for start in starts]
+
+    # Cutpoint i lies between distinct values i and i + 1
+    positions = range(len(distinct) - 1)
+    if CUTPOINTSTRATEGY == "boundary":
+        positions = boundaryPositions(column["rows"], starts, decisions)
+    elif CUTPOINTSTRATEGY == "frequency":
+        positions = frequencyPositions(starts, len(values), positions, FREQUENCYBINS - 1)
+    if MAXCUTPOINTS and len(positions) > MAXCUTPOINTS:
+        positions = frequencyPositions(starts, len(values), positions, MAXCUTPOINTS)
 
     numericAttrValuePairs = []
-    low = values[0]
-    high = values[-1]
+    low = distinct[0]
+    high = distinct[-1]
 
     # Find the averages of values and make the two blocks (low to cutpoint, and cutpoint to high)
-    for index in range(0, len(values) - 1):
-        cutpoint = round(((float(values[index]) + float(values[index + 1])) / 2), 6)
-        numericAttrValuePairs.extend([[low, cutpoint], [cutpoint, high]])
+    for index in positions:
+        cutpoint = round(((distinct[index] + distinct[index + 1]) / 2), 6)
+        numericAttrValuePairs.extend([(low, cutpoint), (cutpoint, high)])
 
     return numericAttrValuePairs
 
+# Returns the boundary cutpoints of a ranked attribute: those between two adjacent distinct values
+# whose cases (rows[starts[i]:starts[i + 1]]) don't all have the same decision
+def boundaryPositions(rows, starts, decisions):
+    ends = starts[1:] + [len(rows)]
+    valueDecisions = [set(decisions[row] for row in rows[start:end])
+                      for start, end in zip(starts, ends)]
+    return [index for index in range(len(starts) - 1)
+            if len(valueDecisions[index] | valueDecisions[index + 1]) > 1]
+
+# Picks up to `count` of the given cutpoint positions, the ones splitting the ranked cases closest
+# to intervals of equal frequency (cutpoint i has starts[i + 1] cases below it), in order
+def frequencyPositions(starts, caseCount, positions, count):
+    positions = list(positions)
+    if count <= 0 or not positions:
+        return []
+
+    below = [starts[index + 1] for index in positions]
+    chosen = []
+    for part in range(1, count + 1):
+        target = part * caseCount / (count + 1)
+        index = bisect_left(below, target)
+        # Take the closer of the two cutpoints around the target
+        if index == len(below) or index > 0 and target - below[index - 1] <= below[index] - target:
+            index -= 1
+        if not chosen or chosen[-1] != positions[index]:
+            chosen.append(positions[index])
+    return chosen
+
+# Builds one block per entry of ends holding the first ends[i] of the given rows. The ends must be
+# nondecreasing, which lets the bitmap backend grow each block from the previous one.
+def prefixBlocks(rows, ends):
+    blocks = []
+    if BITMAPBLOCKS:
+        bits = 0
+        start = 0
+        for end in ends:
+            if end > start:
+                bits |= bitsFromCases(rows[start:end])
+                start = end
+            blocks.append(BitmapBlock.fromBits(bits))
+    else:
+        for end in ends:
+            blocks.append(set(rows[:end]))
+    return blocks
+
+# Builds one block per entry of starts holding the given rows from starts[i] on (starts must be
+# nondecreasing)
+def suffixBlocks(rows, starts):
+    if BITMAPBLOCKS:
+        allBits = bitsFromCases(rows)
+        return [BitmapBlock.fromBits(allBits & ~prefix.bits)
+                for prefix in prefixBlocks(rows, starts)]
+    return [set(rows[start:]) for start in starts]
+
+# Returns the number of cases a block shares with the goal, weighted by the CaseWeights if there
+# are any (lazy blocks otherwise count them without building the intersection)
+def intersectionSize(block, goal, weights = None):
+    if weights:
+        return weights.size(block.intersection(goal))
+    if isinstance(block, RangeBlock):
+        return block.column.goalCount(goal, block.start, block.end)
+    return len(block.intersection(goal))
+
 # Generates attribute value blocks given a universe and input attributes/concepts
-def generateAVBlocks(universe, attrIndex, attrType, attribute, concepts):
+# Numeric attributes are keyed by (low, high) tuples of floats, symbolic ones by their value
+def generateAVBlocks(universe, attrIndex, attrType, attribute, concepts, specifiedIndex = None):
     attrValueDict = OrderedDict()
+    if specifiedIndex is None:
+        specifiedIndex = OrderedDict()
 
-    # If we have a numeric attribute, find the cutpoints and initialize the dictionary
+    # If we have a numeric attribute, find the cutpoints and slice the blocks out of the ranking
     if attrType == 2:
-        cutpointAttrValuePairs = calculateCutpointAttrValuePairs(universe, attrIndex)
-
-        for interval in cutpointAttrValuePairs:
-            intervalString = "{}..{}".format(interval[0], interval[1])
-            attrValueDict[intervalString] = set()
+        column = rankNumericAttribute(universe, attrIndex)
+        rows = column["rows"]
+        values = column["values"]
+        cutpointAttrValuePairs = calculateCutpointAttrValuePairs(column, universe.column(-1))
+
+        # Pairs alternate between (low, cutpoint) and (cutpoint, high)
+        lowerIntervals = cutpointAttrValuePairs[0::2]
+        upperIntervals = cutpointAttrValuePairs[1::2]
+        lowerEnds = [bisect_right(values, high) for low, high in lowerIntervals]
+        upperStarts = [bisect_left(values, low) for low, high in upperIntervals]
+
+        # Without missing values, lazy blocks are just their ranges of the ranking
+        if LAZYBLOCKS and len(rows) == len(universe):
+            ranked = RankedColumn(rows, len(universe))
+            for index in range(len(lowerIntervals)):
+                attrValueDict[lowerIntervals[index]] = RangeBlock(ranked, 0, lowerEnds[index])
+                attrValueDict[upperIntervals[index]] = RangeBlock(ranked, upperStarts[index],
+                                                                  len(rows))
+            return attrValueDict
+
+        lowerBlocks = prefixBlocks(rows, lowerEnds)
+        upperBlocks = suffixBlocks(rows, upperStarts)
+
+        for index in range(len(lowerIntervals)):
+            attrValueDict[lowerIntervals[index]] = lowerBlocks[index]
+            attrValueDict[upperIntervals[index]] = upperBlocks[index]
 
     attrConceptVals = []
     dontCareVals = []
+    values = universe.dictionary(attrIndex)
+    valueRows = [[] for value in values]
 
-    # For every value, if it isn't incomplete, add it to every block it belongs in
-    for row, case in enumerate(universe):
-        value = case[attrIndex]
-
+    # For every value, if it isn't incomplete, add it to the rows of its block
+    for row, code in enumerate(universe.column(attrIndex)):
         # If don't care case, add to all existing blocks
-        if value == "*":
+        if code == DONTCAREVALUE:
             dontCareVals.append(row)
         # If attribute-concept case, come back to them at the end
-        elif value == "-":
+        elif code == ATTRCONCEPTVALUE:
             attrConceptVals.append(row)
         # If lost value, move on
-        elif value == "?":
-            continue
-        # Add this case to the interval setup from cutpoints
-        else:
-            # If the attribute is numeric, add it to all intervals it belongs to
-            if attrType == 2:
-                value = float(value)
-
-                # Check every interval to see if this value is in range
-                for interval in cutpointAttrValuePairs:
-                    if value >= interval[0] and value <= interval[1]:
-                        attrValueDict["{}..{}".format(interval[0], interval[1])].add(row)
-            # If this symbolic attribute exists in the dictionary, add the case number
-            elif value in attrValueDict:
-                attrValueDict[value].add(row)
-            # Else, add the newly seen symbolic value as a key in the block table
-            else:
-                attrValueDict[value] = set([row])
+        elif code >= 0:
+            valueRows[code].append(row)
+
+    # Symbolic values become keys of the block table in order of appearance
+    if attrType == 1:
+        for code, rows in enumerate(valueRows):
+            attrValueDict[values[code]] = set(rows)
 
     # If we're dealing with incomplete data, handle those cases here
-    if __incompleteDataset__:
+    if universe.incomplete:
         # Add all attribute concepts values to blocks which are specified in the concept
         for case in attrConceptVals:
-            decision = universe[case][-1]
-            attrConcept = calculateValuesSpecified(universe, attrIndex, concepts[decision])
-            # For every specified case, add this value to the intervals it was added to
-            for item in attrConcept:
-                # If the attribute is numeric, add it to all intervals it belongs to
-                if attrType == 2:
-                    itemVal = float(item)
-                    for interval in cutpointAttrValuePairs:
-                        if itemVal >= interval[0] and itemVal <= interval[1]:
-                            attrValueDict["{}..{}".format(interval[0], interval[1])].add(case)
-                else:
+            decision = universe.value(case, -1)
+            attrConcept = specifiedEntry(universe, attrIndex, concepts, decision,
+                                         specifiedIndex)["values"]
+            if not attrConcept:
+                continue
+
+            # If the attribute is numeric, add it to all intervals holding a specified value: the
+            # lower intervals reaching the smallest one and the upper intervals from the largest
+            if attrType == 2:
+                smallest = min(float(item) for item in attrConcept)
+                largest = max(float(item) for item in attrConcept)
+                for low, high in cutpointAttrValuePairs:
+                    if smallest <= high and largest >= low:
+                        attrValueDict[(low, high)].add(case)
+            else:
+                for item in attrConcept:
                     attrValueDict[item].add(case)
         # Add all don't care values to every block
         for item in attrValueDict.values():
             item.update(dontCareVals)
 
+    # Pack the finished blocks if the bitmap backend was selected
+    if BITMAPBLOCKS:
+        for value, block in attrValueDict.items():
+            attrValueDict[value] = BitmapBlock(block)
+
     return attrValueDict
 
-# Calculates the approximations of the concepts within the universe
-def calculateApprox(sets, concepts, approxType):
-    approximations = OrderedDict()
+# Runs in a worker process of blockPool and generates the blocks of one attribute. Returns them
+# along with the entries the attribute added to the index of specified values.
+def blockWorker(job):
+    attrIndex, attrType, attribute = job
+    universe, concepts = __parallelState__
+    specifiedIndex = OrderedDict()
+    attrValSet = generateAVBlocks(universe, attrIndex, attrType, attribute, concepts,
+                                  specifiedIndex)
+    return attrValSet, specifiedIndex
+
+# Updates the blocks of a complete attribute for the given rows appended to the universe, without
+# going over the earlier rows. knownValues is the number of distinct values the attribute had
+# before.
+# Returns the new block table of the attribute, which equals the one generateAVBlocks makes for the
+# grown universe with the "all" cutpoint strategy. Blocks are never changed in place (rules and sets
+# may share them): a block gaining rows is replaced by a new one.
+def appendAVBlocks(universe, attrIndex, attrType, attrValSet, rows, knownValues):
+    if attrType == 2:
+        return appendNumericBlocks(universe, attrIndex, attrValSet, rows, knownValues)
 
-    for decision, concept in concepts.items():
-        approximations[decision] = set()
-        currentSets = []
+    attrValSet = OrderedDict(attrValSet)
+    valueRows = OrderedDict()
+    for row in rows:
+        valueRows.setdefault(universe.value(row, attrIndex), []).append(row)
 
-        # If the dataset is incomplete, use concept approximations (only take from concept cases)
-        if __incompleteDataset__:
-            for number in concept:
-                currentSets.append(sets[number])
+    # New values become keys in order of appearance, after the earlier ones
+    for value, newRows in valueRows.items():
+        if value in attrValSet:
+            attrValSet[value] = attrValSet[value].union(newRows)
         else:
-            currentSets = sets
+            attrValSet[value] = newBlock(newRows)
+    return attrValSet
+
+# Numeric part of appendAVBlocks. A cutpoint between two values that were already neighbours keeps
+# its blocks, extended with the new rows on each side. A new value splits the cutpoint around it in
+# two: their lower blocks start from the earlier rows up to the closest earlier value below, and
+# their upper blocks are the rest of the universe.
+def appendNumericBlocks(universe, attrIndex, attrValSet, rows, knownValues):
+    # The ranking of a lazy attribute changes throughout, so it is ranked again
+    if any(isinstance(block, RangeBlock) for block in islice(attrValSet.values(), 1)):
+        return generateAVBlocks(universe, attrIndex, 2, None, None)
+
+    numbers = universe.numericColumn(attrIndex)
+    knownDistinct = sorted(set(float(value)
+                               for value in universe.dictionary(attrIndex)[:knownValues]))
+    lowerBlocks = list(attrValSet.values())[0::2]
+    upperBlocks = list(attrValSet.values())[1::2]
+    knownCutpoints = OrderedDict()
+    for index in range(len(knownDistinct) - 1):
+        knownCutpoints[(knownDistinct[index], knownDistinct[index + 1])] = index
+
+    rows = sorted(rows, key = numbers.__getitem__)
+    rowValues = [numbers[row] for row in rows]
+    distinct = sorted(set(knownDistinct).union(rowValues))
+    everyRow = newBlock(range(len(universe)))
+    knownRows = newBlock(range(len(universe) - len(rows)))
+
+    attrValSet = OrderedDict()
+    low = distinct[0]
+    high = distinct[-1]
+    for index in range(len(distinct) - 1):
+        cutpoint = round(((distinct[index] + distinct[index + 1]) / 2), 6)
+        below = rows[:bisect_right(rowValues, cutpoint)]
+        above = rows[len(below):]
+
+        known = knownCutpoints.get((distinct[index], distinct[index + 1]))
+        if known is not None:
+            lowerBlock = lowerBlocks[known].union(below) if below else lowerBlocks[known]
+            upperBlock = upperBlocks[known].union(above) if above else upperBlocks[known]
+        else:
+            position = bisect_right(knownDistinct, cutpoint)
+            if position == 0:
+                lowerBlock = newBlock(below)
+            elif position == len(knownDistinct):
+                lowerBlock = knownRows.union(below)
+            else:
+                lowerBlock = lowerBlocks[position - 1].union(below)
+            upperBlock = everyRow - lowerBlock
+
+        attrValSet[(low, cutpoint)] = lowerBlock
+        attrValSet[(cutpoint, high)] = upperBlock
+    return attrValSet
+
+# Restricts the blocks of a complete attribute to the rows of mask, giving the block table that
+# generateAVBlocks makes (with the "all" cutpoint strategy) for a dataset of just those rows, with
+# the rows keeping their numbers. Symbolic values left without rows are dropped and the others are
+# put in order of their first row. Numeric cutpoints between values that are still neighbours keep
+# their blocks (masked); where values in between are gone, the cutpoint is moved to the midpoint
+# of the values left, taking the masked blocks of the first cutpoint past the lower one.
+def maskAVBlocks(universe, attrIndex, attrType, attrValSet, mask):
+    if attrType == 2:
+        return maskNumericBlocks(universe, attrIndex, attrValSet, mask)
+
+    blocks = []
+    for value, block in attrValSet.items():
+        block = block & mask
+        if block:
+            blocks.append((min(block), value, block))
+    blocks.sort(key = lambda entry: entry[0])
+    return OrderedDict((value, block) for first, value, block in blocks)
+
+# Numeric part of maskAVBlocks
+def maskNumericBlocks(universe, attrIndex, attrValSet, mask):
+    numbers = universe.numericColumn(attrIndex)
+    allDistinct = sorted(set(float(value) for value in universe.dictionary(attrIndex)))
+    distinct = sorted(set(numbers[row] for row in mask))
+    lowerBlocks = list(attrValSet.values())[0::2]
+    upperBlocks = list(attrValSet.values())[1::2]
+
+    # The blocks of a lazy attribute become ranges of its ranking restricted to the mask
+    lazy = any(isinstance(block, RangeBlock) for block in lowerBlocks[:1])
+    if lazy:
+        column, positions = lowerBlocks[0].column.subset(mask)
+
+    attrValSet = OrderedDict()
+    low = distinct[0]
+    high = distinct[-1]
+    for index in range(len(distinct) - 1):
+        cutpoint = round(((distinct[index] + distinct[index + 1]) / 2), 6)
+        position = bisect_left(allDistinct, distinct[index])
+        if lazy:
+            lower = lowerBlocks[position]
+            upper = upperBlocks[position]
+            attrValSet[(low, cutpoint)] = RangeBlock(column, positions[lower.start],
+                                                     positions[lower.end])
+            attrValSet[(cutpoint, high)] = RangeBlock(column, positions[upper.start],
+                                                      positions[upper.end])
+        else:
+            attrValSet[(low, cutpoint)] = lowerBlocks[position] & mask
+            attrValSet[(cutpoint, high)] = upperBlocks[position] & mask
+    return attrValSet
+
+# Calculates the lower and upper approximations of every concept in a single pass over the sets.
+# The concepts each set meets are found once per set, which answers both the subset test (lower: the
+# set meets only this concept) and the intersection test (upper: the set meets this concept).
+def calculateApproximations(sets, concepts, incomplete):
+    lower = OrderedDict((decision, newBlock()) for decision in concepts)
+    upper = OrderedDict((decision, newBlock()) for decision in concepts)
+    conceptBlocks = OrderedDict((decision, newBlock(concept))
+                                for decision, concept in concepts.items())
+    setConcepts = {}
+
+    # Returns the decisions of the cases in the set with the given number
+    def conceptsMet(number):
+        if number not in setConcepts:
+            setConcepts[number] = [decision for decision, conceptBlock in conceptBlocks.items()
+                                   if not sets[number].isdisjoint(conceptBlock)]
+        return setConcepts[number]
+
+    # If the dataset is incomplete, use concept approximations (only take from concept cases)
+    if incomplete:
+        for decision, concept in concepts.items():
+            for number in concept:
+                met = conceptsMet(number)
+                if met == [decision]:
+                    lower[decision].update(sets[number])
+                if decision in met:
+                    upper[decision].update(sets[number])
+    else:
+        for number, block in enumerate(sets):
+            met = conceptsMet(number)
+            if len(met) == 1:
+                lower[met[0]].update(block)
+            for decision in met:
+                upper[decision].update(block)
 
-        for block in currentSets:
-            if approxType == "lower":
-                if block.issubset(concept):
-                    approximations[decision].update(block)
-            elif not block.isdisjoint(concept):
-                approximations[decision].update(block)
-    return approximations
+    return lower, upper
 
-# Splits up an input interval by the deliminator ".." and returns a list of the two intervals
-def generateFloatInterval(interval):
-    edges = interval.split("..")
-    return [float(i) for i in edges]
+# Calculates the approximations of the concepts within the universe
+def calculateApprox(sets, concepts, approxType, incomplete):
+    lower, upper = calculateApproximations(sets, concepts, incomplete)
+    return lower if approxType == "lower" else upper
+
+# Calculates the block of cases that a single value of attribute i can match when building a
+# characteristic set. Returns None for lost and don't care values (they match the whole universe).
+def characteristicBlock(universe, attrValueDict, attributes, attrTypes, concepts, i, value,
+                        decision, specifiedIndex):
+    # Don't care and lost cases equate to the universe in this function
+    if value == '*' or value == '?':
+        return None
+    # Attribute concept values: the union of the blocks of every value specified in the concept
+    elif value == '-':
+        entry = specifiedEntry(universe, i, concepts, decision, specifiedIndex)
+        if entry["block"] is None:
+            entry["block"] = newBlock()
+            for temp in entry["values"]:
+                for key, tempSet in attrValueDict[attributes[i]].items():
+                    if attrTypes[i] == 1:
+                        if temp == key:
+                            entry["block"].update(tempSet)
+                    elif key[0] <= float(temp) <= key[1]:
+                        entry["block"].update(tempSet)
+        return entry["block"]
+    # Symbolic values
+    elif attrTypes[i] == 1:
+        return attrValueDict[attributes[i]][value]
+
+    # Numeric values: calculate the "common area" for this value
+    value = float(value)
+    result = newBlock()
+    for edges, intervalSet in attrValueDict[attributes[i]].items():
+        # If this value is in range of this interval, see if we can tighten with it
+        if edges[0] <= value <= edges[1]:
+            result.update(intervalSet)
+    return result
 
 # Calculates the characteristic sets for the input universe
-def calculateCSets(universe, attrValueDict, attributes, attrTypes, concepts):
+# The block for every attribute value is computed once, and cases with the same values (and the
+# same concept when an attribute-concept value is involved) share a single characteristic set.
+def calculateCSets(universe, attrValueDict, attributes, attrTypes, concepts, specifiedIndex = None):
+    if specifiedIndex is None:
+        specifiedIndex = OrderedDict()
     characteristicSets = []
-
-    for case in universe:
-        runningResult = set()
-
-        # For every attribute
-        for i in range(0, len(attributes) - 1):
-            value = case[i]
-            currentResult = set()
-
-            # Don't care and lost cases equate to the universe in this function
-            if value == '*' or value == '?':
-                continue
-            # Attribute concept values
-            elif value == '-':
-                valuesSpecified = calculateValuesSpecified(universe, i, concepts[case[-1]])
-                for temp in valuesSpecified:
-                    for key, tempSet in attrValueDict[attributes[i]].items():
-                        if attrTypes[i] == 1:
-                            if temp == key:
-                                currentResult.update(tempSet)
-                        else:
-                            temp = float(temp)
-                            edges = generateFloatInterval(key)
-
-                            if edges[0] <= temp <= edges[1]:
-                                currentResult.update(tempSet)
-            # Symbolic values
-            elif attrTypes[i] == 1:
-                currentResult = attrValueDict[attributes[i]][value]
-            else:
-                value = float(value)
-
-                # Calculate the "common area" for this
-                for key, intervalSet in attrValueDict[attributes[i]].items():
-                    edges = generateFloatInterval(key)
-
-                    # If this value is in range of this interval, see if we can tighten with it
-                    if edges[0] <= value <= edges[1]:
-                        currentResult.update(intervalSet)
-            # If this is the first intersecting set, make it the running result
-            if not runningResult:
-                runningResult = currentResult
-            elif currentResult:
-                runningResult = set.intersection(runningResult, currentResult)
+    valueBlocks = {}
+    knownSets = {}
+
+    columns = [universe.column(i) for i in range(0, len(attributes) - 1)]
+    symbols = [universe.symbols(i) for i in range(0, len(attributes) - 1)]
+    decisionCodes = universe.column(-1)
+    decisions = universe.symbols(-1)
+
+    for row, codes in enumerate(zip(*columns)):
+        decisionCode = decisionCodes[row]
+        signature = codes + (decisionCode,) if ATTRCONCEPTVALUE in codes else codes
+
+        if signature not in knownSets:
+            runningResult = newBlock()
+
+            # For every attribute
+            for i, code in enumerate(codes):
+                key = (i, code, decisionCode if code == ATTRCONCEPTVALUE else None)
+                if key not in valueBlocks:
+                    valueBlocks[key] = characteristicBlock(universe, attrValueDict, attributes,
+                                                           attrTypes, concepts, i, symbols[i][code],
+                                                           decisions[decisionCode], specifiedIndex)
+                currentResult = valueBlocks[key]
+                if currentResult is None:
+                    continue
+
+                # If this is the first intersecting set, make it the running result
+                if not runningResult:
+                    runningResult = currentResult
+                elif currentResult:
+                    runningResult = runningResult.intersection(currentResult)
+            knownSets[signature] = runningResult
+
+        runningResult = knownSets[signature]
         if not runningResult:
             print("Error, characteristic set is empty.")
         else:
@@ -411,37 +1338,198 @@ def calculateCSets(universe, attrValueDict, attributes, attrTypes, concepts):
 
     return characteristicSets
 
-# Determine if the two input cases have all equivalent attributes. Returns false as soon as an
-# attribute doesn't match. If all attributes are checked without failure, return true.
-def equivalentCases(case, caseOther):
-    for i in range(0, len(case) - 1):
-        if case[i] != caseOther[i]:
-            return False
-    return True
-
-# Calculates A* for the given universe. This function parses each case to determine duplicate
-# cases, when a duplicate is found (all attribute values match that of another case or cases), it
-# is added to the set of cases which share all the same attributes
-def calculateAStar(universe):
-    aStar = []
+# Partitions the universe by indiscernibility on the attributes at attrIndices (all of the
+# attributes except the decision by default). Each case is hashed by its tuple of values in a single
+# pass. Returns a list of classes, each a list of row numbers, ordered by the first case of each
+# class.
+def calculatePartition(universe, attrIndices = None):
+    if attrIndices is None:
+        attrIndices = range(0, len(universe.attributes) - 1)
+    columns = [universe.column(i) for i in attrIndices]
+
+    # Without any attributes every case is indiscernible from the others
+    if not columns:
+        return [list(range(len(universe)))] if len(universe) else []
+
+    classes = OrderedDict()
+    for row, key in enumerate(zip(*columns)):
+        if key in classes:
+            classes[key].append(row)
+        else:
+            classes[key] = [row]
 
-    # For every case in the universe, check if it equals an already seen set
-    for row, case in enumerate(universe):
-        exists = False
+    return list(classes.values())
 
-        # For every exisitng A* set, check if this case matches a defined one (Add it if it does)
-        for aSet in aStar:
-            if equivalentCases(case, universe[aSet[0]]):
-                aSet.append(row)
-                exists = True
-                break
-        if not exists:
-            aStar.append([row])
-    # Convert them to sets
-    for index, aSet in enumerate(aStar):
-        aStar[index] = set(aSet)
+# Calculates A* for the given universe: the sets of cases which share all the same attribute values
+def calculateAStar(universe):
+    return [newBlock(aSet) for aSet in calculatePartition(universe)]
+
+# Updates A* (as calculateAStar returns it) and the approximations of a complete universe for the
+# given rows appended to it, without going over the earlier rows. A new row joins the class of the
+# earlier cases with its values, or starts a new class at the end. Only the classes that gained
+# rows are taken out of the approximations they were in and put back into the ones they are in now.
+# The concepts must already hold the new rows. Returns the new A*, lower and upper approximations.
+def appendAStar(universe, sets, lower, upper, concepts, rows):
+    columns = [universe.column(i) for i in range(0, len(universe.attributes) - 1)]
+    decisions = universe.symbols(-1)
+    decisionCodes = universe.column(-1)
+
+    # The values of every class are those of its first case
+    classes = {}
+    for number, block in enumerate(sets):
+        first = min(block)
+        classes[tuple(column[first] for column in columns)] = number
+
+    sets = list(sets)
+    changed = OrderedDict()
+    for row in rows:
+        key = tuple(column[row] for column in columns)
+        if key not in classes:
+            classes[key] = len(sets)
+            sets.append(newBlock())
+        changed.setdefault(classes[key], []).append(row)
+
+    lower = OrderedDict((decision, lower.get(decision, newBlock())) for decision in concepts)
+    upper = OrderedDict((decision, upper.get(decision, newBlock())) for decision in concepts)
+    for number, newRows in changed.items():
+        block = sets[number]
+        if block:
+            met = set(decisions[decisionCodes[case]] for case in block)
+            for decision in met:
+                upper[decision] = upper[decision] - block
+                if len(met) == 1:
+                    lower[decision] = lower[decision] - block
+
+        block = sets[number] = block.union(newRows)
+        met = set(decisions[decisionCodes[case]] for case in block)
+        for decision in met:
+            upper[decision] = upper[decision].union(block)
+            if len(met) == 1:
+                lower[decision] = lower[decision].union(block)
+
+    return sets, lower, upper
+
+# Cases that repeat exactly (the same values, decision included) collapsed into their first
+# occurrence, which stands for all of them (its members) with their number as its weight. Duplicate
+# cases are in the same blocks, characteristic sets and approximations, so the rules induced over
+# the representatives with every count weighted (see calcLargestAVIntersection and CandidateIndex)
+# are those of the full universe once their coverage is expanded back to the members. Only the
+# cases in rows (every case by default) are collapsed.
+class CaseWeights:
+    def __init__(self, universe, rows = None):
+        if rows is None:
+            rows = range(len(universe))
+        values = list(zip(*universe.columns))
+        first = {}
+        self.members = OrderedDict()
+        for row in rows:
+            self.members.setdefault(first.setdefault(values[row], row), []).append(row)
+
+        self.weights = [0] * len(universe)
+        for representative, members in self.members.items():
+            self.weights[representative] = len(members)
+        self.representatives = newBlock(self.members)
+        self.duplicates = len(rows) - len(self.members)
+
+        # The representatives standing for more than one case, few enough that a block is weighed
+        # by its size plus the duplicates of the ones it holds. Bitmaps are weighed without walking
+        # their bits, by masks of the representatives with every bit of that number of duplicates.
+        self.extras = [max(weight - 1, 0) for weight in self.weights]
+        self.heavy = newBlock(case for case, members in self.members.items() if len(members) > 1)
+        self.masks = []
+        if BITMAPBLOCKS:
+            for bit in range(max(self.extras, default = 0).bit_length()):
+                self.masks.append(bitsFromCases(case for case in self.heavy
+                                                if self.extras[case] >> bit & 1))
+
+        # Running weights along the ranking of every lazy attribute, which weigh its ranges, and
+        # the weighted sizes of the blocks of the collapsed table by id. Both are made by
+        # collapseTable and never change afterwards, so inductions can share them. The copies made
+        # for inductions also weigh the blocks merged into their table once (see induction).
+        self.prefixes = {}
+        self.tableSizes = {}
+        self.merged = None
+        self.attrValueDict = None
+
+    # Sets attrValueDict to the block table restricted to the representatives (lazy blocks become
+    # ranges of the ranking of the representatives) and weighs its blocks. Inductions work on
+    # copies of the table, so the blocks they merge are weighed by size() every time instead.
+    def collapseTable(self, attrValueDict):
+        self.attrValueDict = OrderedDict()
+        columns = {}
+        for attribute, attrValSet in attrValueDict.items():
+            collapsed = OrderedDict()
+            for value, block in attrValSet.items():
+                if isinstance(block, RangeBlock):
+                    if block.column not in columns:
+                        columns[block.column] = block.column.subset(self.representatives)
+                        column = columns[block.column][0]
+                        self.prefixes[column] = [0] + list(accumulate(
+                            map(self.weights.__getitem__, column.rows)))
+                    column, positions = columns[block.column]
+                    block = RangeBlock(column, positions[block.start], positions[block.end])
+                else:
+                    block = block.intersection(self.representatives)
+                collapsed[value] = block
+            self.attrValueDict[attribute] = collapsed
+
+        # The table keeps its blocks alive, so their ids can't be taken by other blocks
+        self.tableSizes = dict((id(block), self.size(block))
+                               for attrValSet in self.attrValueDict.values()
+                               for block in attrValSet.values())
+
+    # Returns the representatives of the cases of a block
+    def collapse(self, block):
+        return block.intersection(self.representatives)
+
+    # Returns the members of the representatives in a block
+    def expand(self, block):
+        return newBlock(chain.from_iterable(map(self.members.__getitem__, block)))
+
+    # Returns the number of cases the representatives in a block stand for
+    def size(self, block):
+        if isinstance(block, RangeBlock):
+            prefix = self.prefixes[block.column]
+            return prefix[block.end] - prefix[block.start]
+        if isinstance(block, BitmapBlock):
+            return len(block) + sum((block.bits & mask).bit_count() << bit
+                                    for bit, mask in enumerate(self.masks))
+        return len(block) + sum(map(self.extras.__getitem__, block.intersection(self.heavy)))
+
+    # Returns a copy of the weights for one induction, whose table also gets the blocks merged
+    # while inducing. Their sizes are kept with the blocks (so their ids can't be reused) until the
+    # copy is dropped with the induction's table.
+    def induction(self):
+        weights = copy(self)
+        weights.tableSizes = dict(self.tableSizes)
+        weights.merged = []
+        return weights
+
+    # Returns the weighted size of a block of the table, weighed in advance for the blocks of the
+    # collapsed table
+    def tableSize(self, block):
+        size = self.tableSizes.get(id(block))
+        if size is None:
+            size = self.size(block)
+            if self.merged is not None:
+                self.tableSizes[id(block)] = size
+                self.merged.append(block)
+        return size
+
+# Finds the duplicate cases among the given rows of a universe (every case by default) and collapses
+# the block table to their representatives. Returns the CaseWeights, or None if no case repeats.
+def collapseDuplicates(universe, attrValueDict, rows = None):
+    weights = CaseWeights(universe, rows)
+    if __instrumentation__:
+        __instrumentation__.count("duplicates", weights.duplicates)
+    if STATUSINFO:
+        print("{} duplicate cases collapsed into {} representatives.\n".format(
+            weights.duplicates, len(weights.members)))
+    if not weights.duplicates:
+        return None
 
-    return aStar
+    weights.collapseTable(attrValueDict)
+    return weights
 
 # Calculates the tightest interval within the input intervals
 # Assumes the input intervals have a valid common area
@@ -449,8 +1537,7 @@ def calculateInterval(intervals):
     low = "unset"
     high = "unset"
 
-    for interval in intervals:
-        edges = generateFloatInterval(interval)
+    for edges in intervals:
         # First time set
         if low == "unset":
             low = edges[0]
@@ -461,20 +1548,77 @@ def calculateInterval(intervals):
 
     return [low, high]
 
+# Blocks of the intervals merged by compressIntervals when INTERVALCACHE is set. They are kept out
+# of the block table, so the table keeps its original size and merged intervals never become
+# candidates. At most `size` blocks are held, the least recently used is evicted first, and an
+# evicted block is rebuilt on demand: a merged interval (low, high) is the intersection of the
+# original intervals (low, highest) and (lowest, high) of its attribute. hits and misses count the
+# lookups of merged intervals.
+class IntervalCache:
+    def __init__(self, attrValueDict, size = None):
+        self.attrValueDict = attrValueDict
+        self.size = size or INTERVALCACHESIZE
+        self.blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, attribute, interval, block):
+        key = (attribute, interval)
+        self.blocks[key] = block
+        self.blocks.move_to_end(key)
+        while len(self.blocks) > self.size:
+            self.blocks.popitem(last = False)
+
+    # Returns the block of a condition, from the block table or, for a merged interval, the cache
+    def block(self, attribute, value):
+        attrValSet = self.attrValueDict[attribute]
+        if value in attrValSet:
+            return attrValSet[value]
+
+        key = (attribute, value)
+        if key in self.blocks:
+            self.hits += 1
+            self.blocks.move_to_end(key)
+            return self.blocks[key]
+
+        # The first two intervals of a numeric attribute are (lowest, c) and (c, highest)
+        self.misses += 1
+        keys = iter(attrValSet)
+        lowest = next(keys)[0]
+        highest = next(keys)[1]
+        block = attrValSet[(value[0], highest)].intersection(attrValSet[(lowest, value[1])])
+        self.add(attribute, value, block)
+        return block
+
+    # Moves the hit and miss counts to the instrumentation
+    def flush(self):
+        if __instrumentation__:
+            __instrumentation__.count("intervalHits", self.hits)
+            __instrumentation__.count("intervalMisses", self.misses)
+        self.hits = 0
+        self.misses = 0
+
+# Returns the block of a condition, looking merged intervals up in the interval cache if there is
+# one
+def conditionBlock(attrValueDict, attribute, value, intervals = None):
+    if intervals:
+        return intervals.block(attribute, value)
+    return attrValueDict[attribute][value]
+
 # Combine numerical intervals to form the smallest interval (and save the
-# calculated interval sets for condition dropping below
-def compressIntervals(rules, attrValueDict):
+# calculated interval sets for condition dropping below, in the interval cache if there is one)
+def compressIntervals(rules, attrValueDict, intervals = None):
     for key, value in rules.items():
         # If the length > 1, it's a numeric value that needs combining
         if len(value) > 1:
             low = None
             high = None
-            intervalValues = set()
+            intervalValues = newBlock()
 
             # Calculate the "common area" for these conditions
             for interval in rules[key]:
                 tempSet = attrValueDict[key][interval]
-                edges = generateFloatInterval(interval)
+                edges = interval
                 if low == None:
                     low, high = edges
                     intervalValues = tempSet
@@ -486,152 +1630,881 @@ def compressIntervals(rules, attrValueDict):
                     # Update the values to the tightest interval we have found
                     intervalValues = intervalValues.intersection(tempSet)
             # Add this interval set to the attrValueDict for condition dropping
-            newInterval = "{}..{}".format(low, high)
-            if newInterval not in attrValueDict[key]:
+            newInterval = (low, high)
+            if newInterval in attrValueDict[key]:
+                pass
+            elif intervals:
+                intervals.add(key, newInterval, intervalValues)
+            else:
                 attrValueDict[key][newInterval] = intervalValues
 
             rules[key] = [newInterval]
 
 # Condition dropping --> if we can do without a condition, drop it
-def dropConditions(rules, attrValueDict, originalGoal):
+# Conditions are tested in order, each against the conditions still in the rule. The blocks of the
+# conditions before it (that were kept) and after it come from running prefix and suffix
+# intersections, so a rule of n conditions takes O(n) intersections. The rule's block is never
+# empty, so neither is any intersection of its conditions.
+def dropConditions(rules, attrValueDict, originalGoal, intervals = None):
+    # A condition is tested without every condition sharing its value list, which the prefix and
+    # suffix intersections can't express
+    valueLists = list(rules.values())
+    if any(valueLists.count(value) > 1 for value in valueLists):
+        dropConditionsQuadratic(rules, attrValueDict, originalGoal, intervals)
+        return
+
+    attributes = list(rules)
+    blocks = [conditionBlock(attrValueDict, attribute, rules[attribute][0], intervals)
+              for attribute in attributes]
+
+    # suffixes[i] is the intersection of the blocks from i on (None for no blocks)
+    suffixes = [None] * (len(blocks) + 1)
+    for index in range(len(blocks) - 1, -1, -1):
+        following = suffixes[index + 1]
+        if following is None:
+            suffixes[index] = blocks[index]
+        else:
+            suffixes[index] = blocks[index].intersection(following)
+    intersections = max(len(blocks) - 1, 0)
+
+    dropped = 0
+    prefix = None
+    for index, attribute in enumerate(attributes):
+        following = suffixes[index + 1]
+        if prefix is None or following is None:
+            testBlock = following if prefix is None else prefix
+        else:
+            testBlock = prefix.intersection(following)
+            intersections += 1
+
+        if testBlock is not None and len(testBlock) and testBlock.issubset(originalGoal):
+            rules.pop(attribute, None)
+            dropped += 1
+        elif prefix is None:
+            prefix = blocks[index]
+        else:
+            prefix = prefix.intersection(blocks[index])
+            intersections += 1
+
+    if __instrumentation__:
+        __instrumentation__.count("intersections", intersections)
+        __instrumentation__.count("dropped", dropped)
+
+# The original condition dropping: recomputes the intersection of the other conditions for every
+# condition
+def dropConditionsQuadratic(rules, attrValueDict, originalGoal, intervals = None):
+    intersections = 0
+    dropped = 0
     for attribute in list(rules):
-        testBlock = set()
+        testBlock = newBlock()
         # Find the intersection without this value
         for testAttr, testVal in rules.items():
-            block = attrValueDict[testAttr][testVal[0]]
+            block = conditionBlock(attrValueDict, testAttr, testVal[0], intervals)
             if testVal != rules[attribute]:
                 if testBlock:
                     testBlock = testBlock.intersection(block)
+                    intersections += 1
                 else:
                     testBlock = block
 
         if len(testBlock) and testBlock.issubset(originalGoal):
             rules.pop(attribute, None)
+            dropped += 1
+
+    if __instrumentation__:
+        __instrumentation__.count("intersections", intersections)
+        __instrumentation__.count("dropped", dropped)
 
 # After condition dropping, compute the final test block to remove from
 # the remaining goal (a.k.a. hardest bug to find ever)
-def calculateCoverage(rules, attrValueDict):
-    matchedSet = set()
+def calculateCoverage(rules, attrValueDict, intervals = None):
+    matchedSet = newBlock()
     for attribute, key in rules.items():
-        block = set(attrValueDict[attribute][key[0]])
+        block = newBlock(conditionBlock(attrValueDict, attribute, key[0], intervals))
         if len(matchedSet):
             matchedSet = matchedSet.intersection(block)
         else:
             matchedSet = block
 
+    if __instrumentation__:
+        __instrumentation__.count("intersections", max(len(rules) - 1, 0))
     return matchedSet
 
 # Calculates the largest intersection given all attribute value blocks and a current goal
-def calcLargestAVIntersection(attrValueDict, attrTypes, rules, goal):
+# The search is pruned with upper bounds: a block can't share more cases with the goal than it
+# holds, so a block smaller than the best intersection so far is never intersected, and neither is
+# one that could at best tie without being smaller (or earlier in the table). The cutpoint blocks
+# of a numeric attribute form two nested chains ([low, c] grows with c and [c, high] shrinks),
+# along which the intersections with the goal grow with the blocks. The best block of a chain is
+# the smallest one reaching the intersection of its largest block, found by binary search.
+# Ties still go to the smallest block, then to the first in table order. With CaseWeights, the
+# sizes and intersections count the cases the representatives stand for.
+def calcLargestAVIntersection(attrValueDict, attrTypes, rules, goal, weights = None):
     match = OrderedDict()
-    match["intersection"] = set()
+    match["intersection"] = newBlock()
     match["value"] = None
     match["attribute"] = None
-    match["matchBlock"] = set()
+    match["matchBlock"] = newBlock()
+
+    # Sizes and table position of the current best match, kept so they aren't recounted for every
+    # block
+    bestCount = 0
+    bestSize = 0
+    bestPosition = -1
+    blockSize = weights.tableSize if weights else len
+    goalSize = weights.size(goal) if weights else len(goal)
+    evaluated = 0
+    pruned = 0
+    offset = 0
 
     for index, (attribute, attrValSet) in enumerate(attrValueDict.items()):
-        for value, t in attrValSet.items():
-            if (attrTypes[index] == 2 and (attribute not in rules or value not in rules[attribute]) or
-                attrTypes[index] == 1 and attribute not in rules):
-                temp = t.intersection(goal)
-                if (len(temp) > len(match["intersection"]) or
-                    len(temp) == len(match["intersection"]) and len(t) < len(match["matchBlock"])):
-                    match["intersection"] = temp
-                    match["value"] = value
-                    match["attribute"] = attribute
-                    match["matchBlock"] = t
+        numeric = attrTypes[index] == 2
+        if not numeric and attribute in rules:
+            offset += len(attrValSet)
+            continue
+        excluded = rules.get(attribute, ())
+        items = list(attrValSet.items())
+
+        # Candidates of the attribute as (count, size, position) of the best block of each chain,
+        # with the blocks outside the chains checked one by one
+        candidates = []
+        if numeric:
+            pairs = nestedPairs(items)
+            chains = [(range(0, 2 * pairs, 2), False), (range(2 * pairs - 1, 0, -2), True)]
+            rest = range(2 * pairs, len(items))
+        else:
+            chains = []
+            rest = range(len(items))
+
+        # Both chains go from the smallest block to the largest. Blocks already in the rule can't
+        # be chosen, but they are still nested in their chain, so the searches run over them.
+        for chain, descending in chains:
+            last = len(chain) - 1
+            while last >= 0 and items[chain[last]][0] in excluded:
+                last -= 1
+            if last < 0:
+                continue
+            if min(blockSize(items[chain[last]][1]), goalSize) < bestCount:
+                pruned += last + 1
+                continue
+
+            # The first block reaching the intersection of the largest one
+            largest = intersectionSize(items[chain[last]][1], goal, weights)
+            lower = 0
+            upper = last
+            intersections = 1
+            while lower < upper:
+                middle = (lower + upper) // 2
+                intersections += 1
+                if intersectionSize(items[chain[middle]][1], goal, weights) >= largest:
+                    upper = middle
+                else:
+                    lower = middle + 1
+            while items[chain[lower]][0] in excluded:
+                lower += 1
+            evaluated += intersections
+            pruned += max(last + 1 - intersections, 0)
+
+            # Equal nested blocks are the same block; the [c, high] chain runs against table order,
+            # so the first of them in the table is the last of them in the chain
+            size = blockSize(items[chain[lower]][1])
+            if descending:
+                first = lower
+                upper = last
+                while lower < upper:
+                    middle = (lower + upper + 1) // 2
+                    if blockSize(items[chain[middle]][1]) == size:
+                        lower = middle
+                    else:
+                        upper = middle - 1
+                while lower > first and items[chain[lower]][0] in excluded:
+                    lower -= 1
+            candidates.append((largest, size, chain[lower]))
+
+        for position in rest:
+            value, t = items[position]
+            if value in excluded:
+                continue
+
+            size = blockSize(t)
+            if min(size, goalSize) < bestCount or min(size, goalSize) == bestCount and \
+                    (size > bestSize or size == bestSize and offset + position > bestPosition):
+                pruned += 1
+                continue
+            evaluated += 1
+            candidates.append((intersectionSize(t, goal, weights), size, position))
+
+        for count, size, position in candidates:
+            if count > bestCount or count == bestCount and (size < bestSize or
+                                                            size == bestSize and
+                                                            offset + position < bestPosition):
+                match["value"], match["matchBlock"] = items[position]
+                match["attribute"] = attribute
+                bestCount = count
+                bestSize = size
+                bestPosition = offset + position
+        offset += len(items)
+
+    if match["attribute"] is not None:
+        match["intersection"] = match["matchBlock"].intersection(goal)
+    if __instrumentation__:
+        __instrumentation__.count("candidates", evaluated)
+        __instrumentation__.count("intersections", evaluated)
+        __instrumentation__.count("pruned", pruned)
     return match
 
-# Uses input numerator and denominator to print useful information while calculating rules
-def goalStatus(goalCompleted, goalSize):
-    print("\r{}%\t[".format(round(goalCompleted / goalSize * 100), 1), end = "", flush = True)
-    calc = int(goalCompleted / goalSize * 51)
-    for i in range(calc):
-        print("=", end = "", flush = True)
-    for i in range(51 - calc):
-        print(" ", end = "", flush = True)
-    print("] {} / {}".format(goalCompleted, goalSize), end = "", flush = True)
+# Returns the number of (low, c), (c, high) cutpoint block pairs at the start of the block table of
+# a numeric attribute (merged intervals added later come after them, as narrower intervals)
+def nestedPairs(items):
+    if len(items) < 2:
+        return 0
+    low = items[0][0][0]
+    high = items[1][0][1]
+
+    # Find the first pair that isn't a cutpoint pair
+    lower = 0
+    upper = len(items) // 2
+    while lower < upper:
+        middle = (lower + upper) // 2
+        if items[2 * middle][0][0] == low and items[2 * middle + 1][0][1] == high:
+            lower = middle + 1
+        else:
+            upper = middle
+    return lower
+
+# Incremental replacement for calcLargestAVIntersection. Instead of intersecting every block with
+# the goal on every call, the index keeps the size of each block's intersection with the current
+# goal and only adjusts the counts touched by cases entering or leaving the goal (found through a
+# case -> blocks inverted index). The best block comes off a heap keyed by (intersection, block
+# size, table order), which gives the same choice and tie-breaking as the full scan. With
+# CaseWeights, every case counts as the cases it stands for.
+class CandidateIndex:
+    def __init__(self, attrValueDict, attrTypes, weights = None):
+        self.attrValueDict = attrValueDict
+        self.attrTypes = attrTypes
+        self.weights = weights
+        self.blockSize = weights.size if weights else len
+        self.tableBlockSize = weights.tableSize if weights else len
+        self.blocks = []        # [attrIndex, attribute, value, block] for every block id
+        self.caseBlocks = {}    # case number -> list of block ids containing it
+        self.counts = []        # size of each block's intersection with the current goal
+        self.heap = []
+        self.goal = newBlock()
+        self.tableSizes = [0] * len(attrValueDict)
+        self.registerBlocks()
+
+    # Adds any blocks that are not indexed yet (compressIntervals can insert new intervals into
+    # the block table between calls). Their position in the table is kept for tie-breaking.
+    def registerBlocks(self):
+        added = False
+        for index, (attribute, attrValSet) in enumerate(self.attrValueDict.items()):
+            if len(attrValSet) == self.tableSizes[index]:
+                continue
 
-# The function is responsible for taking input attribute value pairs/block and a set of goals in
-# order to determine a set of rules for this dataset. No matter the specification of possible or
-# certain rules, this will produce the desired output given the correct blocks and goals.
-def mlem2(attrValueDict, attrTypes, goals, attrDecision):
-    if STATUSINFO:
-        print("-------------------------------------------------------------\n")
-        print("Rule induction commencing for calculated goals:")
-        listPrint(goals.items())
+            newItems = islice(attrValSet.items(), self.tableSizes[index], None)
+            for position, (value, t) in enumerate(newItems, self.tableSizes[index]):
+                blockId = len(self.blocks)
+                self.blocks.append([index, attribute, value, t])
+                self.counts.append(self.blockSize(t.intersection(self.goal)))
+                for case in t:
+                    self.caseBlocks.setdefault(case, []).append(blockId)
+                self.heap.append(self.heapEntry(blockId, position))
+                added = True
+            self.tableSizes[index] = len(attrValSet)
+
+        if added:
+            heapify(self.heap)
+
+    # Heap entries sort by largest intersection, then smallest block, then order in the table
+    def heapEntry(self, blockId, position):
+        index, attribute, value, t = self.blocks[blockId]
+        return (-self.counts[blockId], self.tableBlockSize(t), index, position, blockId)
+
+    # Moves the counts from the previous goal to the new one by only visiting changed cases
+    def setGoal(self, goal):
+        removed = self.goal - goal
+        added = goal - self.goal
+        self.goal = goal
+
+        if removed:
+            for blockId, count in self.countChanges(removed).items():
+                self.counts[blockId] -= count
+
+        # Counts only ever decrease while a rule is being built, so heap keys stay valid upper
+        # bounds. When cases come back (a new rule is started) the heap has to be rebuilt.
+        if added:
+            for blockId, count in self.countChanges(added).items():
+                self.counts[blockId] += count
+            self.heap = [(-self.counts[entry[-1]],) + entry[1:] for entry in self.heap]
+            heapify(self.heap)
+
+    # Returns by how much the given cases change the count of every block they are in
+    def countChanges(self, cases):
+        changes = Counter(chain.from_iterable(self.caseBlocks.get(case, ()) for case in cases))
+        if self.weights:
+            for case in cases.intersection(self.weights.heavy):
+                extra = self.weights.extras[case]
+                for blockId in self.caseBlocks.get(case, ()):
+                    changes[blockId] += extra
+        return changes
+
+    # Returns the same match as calcLargestAVIntersection for the given rules and goal
+    def largestIntersection(self, rules, goal):
+        self.registerBlocks()
+        self.setGoal(goal)
+
+        match = OrderedDict()
+        match["intersection"] = newBlock()
+        match["value"] = None
+        match["attribute"] = None
+        match["matchBlock"] = newBlock()
+
+        setAside = []
+        evaluated = 0
+        while self.heap:
+            entry = heappop(self.heap)
+            evaluated += 1
+            blockId = entry[-1]
+            count = self.counts[blockId]
+
+            # Stale key, reinsert it with its current count and look again
+            if -entry[0] != count:
+                heappush(self.heap, (-count,) + entry[1:])
+                continue
 
-    ruleSet = []
+            setAside.append(entry)
+            if count == 0:
+                break
+
+            index, attribute, value, t = self.blocks[blockId]
+            attrType = self.attrTypes[index]
+            if (attrType == 2 and (attribute not in rules or value not in rules[attribute]) or
+                attrType == 1 and attribute not in rules):
+                match["intersection"] = t.intersection(goal)
+                match["value"] = value
+                match["attribute"] = attribute
+                match["matchBlock"] = t
+                break
+
+        for entry in setAside:
+            heappush(self.heap, entry)
 
-    # For every concept we're evaluating
-    for decision, originalGoal in goals.items():
-        goal = set(originalGoal)
-        goalSize = len(goal)
-        goalCompleted = 0
-        remainingGoal = goal
-        runningBlock = set()
-        rules = OrderedDict()
+        if __instrumentation__:
+            __instrumentation__.count("candidates", evaluated)
+            __instrumentation__.count("intersections", 1)
+        return match
 
-        if goal and STATUSINFO:
+# Uses input numerator and denominator to print useful information while calculating rules (the
+# default progress callback, the bar is printed in one go)
+def goalStatus(decision, goalCompleted, goalSize, eta):
+    calc = int(goalCompleted / goalSize * 51)
+    remaining = "" if eta is None else "  ~{:.0f}s left".format(eta)
+    print("\r{}%\t[{}{}] {} / {}{:<16}".format(round(goalCompleted / goalSize * 100), "=" * calc,
+                                              " " * (51 - calc), goalCompleted, goalSize,
+                                              remaining), end = "", flush = True)
+
+# Induces the rules for a single concept given its goal (the concept approximation). Returns the
+# rules in ruleSet form: the conditions, the decision pair and the block of cases covered. If a
+# trace list is given, the goal and the sizes of the chosen match are recorded for every search
+# (see blocksAffectTrace). Merged intervals go to the given interval cache, or to one of the
+# concept's own when INTERVALCACHE is set and none is given. With an InductionRun, the concept
+# starts from its checkpointed state and reports every finished rule to the run; if the run's
+# budget is over, the rules found so far are returned. With CaseWeights, the goal holds
+# representatives and the searches, trace and progress count the cases they stand for.
+def induceConcept(attrValueDict, attrTypes, decision, originalGoal, attrDecision, candidates = None,
+                  trace = None, intervals = None, run = None, weights = None):
+    if INTERVALCACHE and intervals is None:
+        intervals = IntervalCache(attrValueDict)
+    blockSize = weights.size if weights else len
+    ruleSet = []
+    goal = newBlock(originalGoal)
+    goalSize = blockSize(goal)
+    goalCompleted = 0
+    remainingGoal = goal
+
+    # Pick up from a checkpoint
+    if run and run.conceptState(decision):
+        ruleSet, remainingGoal = run.conceptState(decision)
+        goal = remainingGoal
+        goalCompleted = goalSize - blockSize(remainingGoal)
+    runningBlock = newBlock()
+    rules = OrderedDict()
+    progress = progressReporter(decision, goalSize) if goal else None
+
+    if progress:
+        if STATUSINFO:
             print("Calculating rules for [{}]".format(decision))
-            goalStatus(goalCompleted, goalSize)
-
-        # While we haven't found a covering
-        while len(remainingGoal):
-            # m has four values
-            # "intersection" - the intersection of the best match with the current goal
-            # "value"        - the value of the attribute
-            # "attribute"    - the attribute of this condition
-            # "matchBlock"   - the entire block of the AV pair
-            m = calcLargestAVIntersection(attrValueDict, attrTypes, rules, goal)
-
-            # Update our running block
-            if runningBlock:
-                runningBlock = runningBlock.intersection(m["matchBlock"])
-            else:
-                runningBlock = m["matchBlock"]
+        progress.update(goalCompleted)
+
+    # While we haven't found a covering
+    while len(remainingGoal):
+        # m has four values
+        # "intersection" - the intersection of the best match with the current goal
+        # "value"        - the value of the attribute
+        # "attribute"    - the attribute of this condition
+        # "matchBlock"   - the entire block of the AV pair
+        if candidates:
+            m = candidates.largestIntersection(rules, goal)
+        else:
+            m = calcLargestAVIntersection(attrValueDict, attrTypes, rules, goal, weights)
 
-            # Append our choice to the rule attributes/values containers
-            if m["attribute"] in rules:
-                rules[m["attribute"]].append(m["value"])
+        if trace is not None:
+            trace.append((goal, blockSize(m["intersection"]), blockSize(m["matchBlock"])))
+
+        # Update our running block
+        if runningBlock:
+            runningBlock = runningBlock.intersection(m["matchBlock"])
+        else:
+            runningBlock = m["matchBlock"]
+
+        # Append our choice to the rule attributes/values containers
+        if m["attribute"] in rules:
+            rules[m["attribute"]].append(m["value"])
+        else:
+            rules[m["attribute"]] = [m["value"]]
+
+        # If we can make a rule, add it to the ruleset and update the goal to be what's missing
+        if runningBlock.issubset(originalGoal):
+            if len(runningBlock) == 0:
+                # print("Empty running block, exiting")
+                remainingGoal = remainingGoal - goal
+                goal = remainingGoal
             else:
-                rules[m["attribute"]] = [m["value"]]
-
-            # If we can make a rule, add it to the ruleset and update the goal to be what's missing
-            if runningBlock.issubset(originalGoal):
-                if len(runningBlock) == 0:
-                    # print("Empty running block, exiting")
-                    remainingGoal = remainingGoal - goal
-                    goal = remainingGoal
-                else:
-                    # Reduce intervals down to one instead of many
-                    compressIntervals(rules, attrValueDict)
-                    # Drop any conditions that are unnecessary
-                    dropConditions(rules, attrValueDict, originalGoal)
+                # Reduce intervals down to one instead of many
+                compressIntervals(rules, attrValueDict, intervals)
+                # Drop any conditions that are unnecessary
+                dropConditions(rules, attrValueDict, originalGoal, intervals)
+
+                # Calculate what our final rule covers
+                match = calculateCoverage(rules, attrValueDict, intervals)
 
-                    # Calculate what our final rule covers
-                    match = calculateCoverage(rules, attrValueDict)
+                if progress:
+                    casesCovered = remainingGoal.intersection(match)
+                    goalCompleted += blockSize(casesCovered)
+                    progress.update(goalCompleted)
 
-                    if STATUSINFO:
-                        casesCovered = remainingGoal.intersection(match)
-                        goalCompleted += len(casesCovered)
-                        goalStatus(goalCompleted, goalSize)
+                goal = remainingGoal = remainingGoal - match
 
-                    goal = remainingGoal = remainingGoal - match
+                ruleSet.append([rules, [attrDecision,  decision], match])
+            rules = OrderedDict()
+            runningBlock = newBlock()
 
-                    ruleSet.append([rules, [attrDecision,  decision]])
+            # Between two rules is the only place the state of the concept can be saved
+            if run and run.ruleFinished(decision, ruleSet, remainingGoal):
+                break
+        else:
+            goal = m["intersection"]
+            if len(goal) == 0:
+                goal = remainingGoal
                 rules = OrderedDict()
-                runningBlock = set()
-            else:
-                goal = m["intersection"]
-                if len(goal) == 0:
-                    goal = remainingGoal
-                    rules = OrderedDict()
 
+    # A concept stopped by the time budget keeps the rules found so far as they are, but its
+    # counts still go to the instrumentation
+    if not (run and len(remainingGoal)):
+        if REDUNDANTRULES:
+            ruleSet = dropRedundantRules(ruleSet, originalGoal)
+        if run:
+            run.conceptFinished(decision, ruleSet)
+    if intervals:
+        intervals.flush()
+
+    if __instrumentation__:
+        __instrumentation__.conceptRules(decision, len(ruleSet))
+    if STATUSINFO:
+        print("\n")
+    return ruleSet
+
+# The final step of LEM2: goes over the rules of a concept in order and drops every rule whose goal
+# cases are all covered by the other rules still in the set. The rules left cover the same cases of
+# the goal. Returns the rules left.
+def dropRedundantRules(ruleSet, originalGoal):
+    goalCases = [list(rule[2].intersection(originalGoal)) for rule in ruleSet]
+    coveredBy = Counter(chain.from_iterable(goalCases))
+
+    kept = []
+    for rule, cases in zip(ruleSet, goalCases):
+        if all(coveredBy[case] > 1 for case in cases):
+            coveredBy.subtract(cases)
+        else:
+            kept.append(rule)
+
+    if __instrumentation__:
+        __instrumentation__.count("redundantRules", len(ruleSet) - len(kept))
+    if STATUSINFO and len(kept) < len(ruleSet):
+        print("\n  **{} redundant rules dropped.".format(len(ruleSet) - len(kept)), end = "")
+    return kept
+
+# Returns a copy of the block table that intervals can be inserted into without changing the
+# original (the blocks themselves are shared, only the dictionaries are copied)
+def copyBlockTable(attrValueDict):
+    return OrderedDict((attribute, OrderedDict(attrValSet))
+                       for attribute, attrValSet in attrValueDict.items())
+
+# Pool initializer of a parallel induction: stores the block table, types, goals, decision name and
+# case weights
+def setParallelState(state):
+    global __parallelState__
+    __parallelState__ = state
+
+# Runs in a worker process forked by mlem2 and induces the rules of one concept. The block table is
+# inherited from the parent; the worker uses its own copy of the table's dictionaries so intervals
+# inserted by compressIntervals don't leak into the next concept it is given. Returns the rules,
+# the intervals inserted into the table (in insertion order) and the search trace.
+def parallelConceptWorker(decision):
+    attrValueDict, attrTypes, goals, attrDecision, weights = __parallelState__
+    table = copyBlockTable(attrValueDict)
+
+    candidates = CandidateIndex(table, attrTypes, weights) if INCREMENTALSEARCH else None
+    trace = []
+    ruleSet = induceConcept(table, attrTypes, decision, goals[decision], attrDecision, candidates,
+                            trace, weights = weights)
+
+    inserted = [(attribute, value, block)
+                for attribute, attrValSet in table.items()
+                for value, block in islice(attrValSet.items(), len(attrValueDict[attribute]), None)]
+    return ruleSet, inserted, trace
+
+# Determines if any of the given blocks could have changed a choice made during an induction: a
+# block changes the search if it would have matched at least as much of the goal as the chosen
+# block with a block no larger (ties are counted, so this errs on the side of a rerun). Sizes are
+# weighted by the CaseWeights of the induction if there are any, as they are in the trace.
+def blocksAffectTrace(blocks, trace, weights = None):
+    blockSize = weights.size if weights else len
+    sizes = [blockSize(block) for block in blocks]
+    for goal, bestCount, bestSize in trace:
+        for block, size in zip(blocks, sizes):
+            if size < bestCount:
+                continue
+            count = intersectionSize(block, goal, weights)
+            if count and (count > bestCount or count == bestCount and size <= bestSize):
+                return True
+    return False
+
+# Induces the rules of every concept on a pool of forked worker processes. Intervals inserted into
+# the block table by one concept are candidates for the following concepts in a serial run, so the
+# results are merged in concept order (and returned by concept): a concept is kept if none of the
+# intervals inserted before it could have changed its searches, otherwise it is induced again here
+# on the up to date table. The rules and the final table are the same as those of a serial run.
+def parallelInduction(attrValueDict, attrTypes, goals, attrDecision, weights = None):
+    originalSizes = OrderedDict((attribute, len(attrValSet))
+                                for attribute, attrValSet in attrValueDict.items())
+
+    # The state reaches the workers through fork, it is never pickled
+    context = multiprocessing.get_context("fork")
+    state = (attrValueDict, attrTypes, goals, attrDecision, weights)
+    with context.Pool(min(os.cpu_count() or 1, len(goals)), initializer = setParallelState,
+                      initargs = (state,)) as pool:
+        results = pool.map(parallelConceptWorker, list(goals), chunksize = 1)
+
+    conceptRuleSets = OrderedDict()
+    for decision, (conceptRules, inserted, trace) in zip(goals, results):
+        # Intervals inserted by the concepts merged so far
+        insertedBefore = [block for attribute, attrValSet in attrValueDict.items()
+                          for block in islice(attrValSet.values(), originalSizes[attribute], None)]
+
+        if insertedBefore and blocksAffectTrace(insertedBefore, trace, weights):
+            if STATUSINFO:
+                print("Inducing rules for [{}] again on the updated block table.".format(decision))
+            candidates = (CandidateIndex(attrValueDict, attrTypes, weights) if INCREMENTALSEARCH
+                          else None)
+            conceptRules = induceConcept(attrValueDict, attrTypes, decision, goals[decision],
+                                         attrDecision, candidates, weights = weights)
+        else:
+            for attribute, value, block in inserted:
+                if value not in attrValueDict[attribute]:
+                    attrValueDict[attribute][value] = block
+            if __instrumentation__:
+                __instrumentation__.conceptRules(decision, len(conceptRules))
+        conceptRuleSets[decision] = conceptRules
+
+    return conceptRuleSets
+
+# A resumable, time-budgeted run of mlem2. Every `interval` seconds (between two rules) the rules
+# found so far and the goal left of every concept are saved to checkpointFileName, along with the
+# intervals merged into the block table. A run given the same checkpoint file picks up where the
+# saved run stopped, provided it has the same goals and starts from the same block table.
+# With a budget (seconds), induction stops at the first rule finished after the budget is spent (so
+# every run, however short its budget, adds at least one rule): complete is then False and
+# uncovered holds, for every concept, the goal cases left without rules.
+# concepts maps each decision to its [rules, goal left] (goal left is None once the concept is
+# finished); a run can also be started from states put there before it begins (see updateRules).
+class InductionRun:
+    def __init__(self, checkpointFileName = None, interval = None, budget = None):
+        self.checkpointFileName = checkpointFileName
+        self.interval = CHECKPOINTINTERVAL if interval is None else interval
+        self.deadline = time.perf_counter() + budget if budget else None
+        self.lastSave = time.perf_counter()
+        self.progressed = False
+        self.complete = True
+        self.resumed = False
+        self.uncovered = OrderedDict()
+        self.concepts = OrderedDict()
+
+    # Starts the run on a block table and goals, loading the checkpoint if there is a matching one
+    def begin(self, attrValueDict, goals, attrDecision):
+        self.attrValueDict = attrValueDict
+        self.goals = goals
+        self.attrDecision = attrDecision
+        self.baseSizes = OrderedDict((attribute, len(attrValSet))
+                                     for attribute, attrValSet in attrValueDict.items())
+        if self.checkpointFileName and os.path.exists(self.checkpointFileName):
+            self.resumed = self.load()
+
+    # Returns the saved (rules, goal left) of a concept that isn't finished yet, or None
+    def conceptState(self, decision):
+        state = self.concepts.get(decision)
+        if state and state[1] is not None:
+            return list(state[0]), state[1]
+        return None
+
+    # Returns the saved rules of a finished concept, or None
+    def conceptRules(self, decision):
+        state = self.concepts.get(decision)
+        if state and state[1] is None:
+            return state[0]
+        return None
+
+    # Records a finished rule of a concept. Returns True if the budget is spent and the concept
+    # should stop here.
+    def ruleFinished(self, decision, ruleSet, remainingGoal):
+        self.concepts[decision] = [list(ruleSet), remainingGoal]
+        self.progressed = True
+        now = time.perf_counter()
+        if self.deadline and now >= self.deadline and len(remainingGoal):
+            self.complete = False
+            self.save()
+            return True
+        if self.interval and now - self.lastSave >= self.interval:
+            self.save()
+        return False
+
+    def conceptFinished(self, decision, ruleSet):
+        self.concepts[decision] = [ruleSet, None]
+        self.progressed = True
+
+    # Returns True once the budget is spent and the run has found a rule
+    def expired(self):
+        if not self.complete:
+            return True
+        return (self.progressed and self.deadline is not None and
+                time.perf_counter() >= self.deadline)
+
+    # Records the goal cases left without rules by a run that stopped early
+    def finish(self):
+        self.uncovered = OrderedDict()
+        for decision, goal in self.goals.items():
+            state = self.concepts.get(decision)
+            if state is None:
+                self.uncovered[decision] = sorted(goal)
+            elif state[1] is not None and len(state[1]):
+                self.uncovered[decision] = sorted(state[1])
+        self.complete = not self.uncovered
+
+    def save(self):
+        if not self.checkpointFileName:
+            return
+
+        checkpoint = OrderedDict()
+        checkpoint["version"] = __version__
+        checkpoint["goals"] = OrderedDict((decision, sorted(goal))
+                                          for decision, goal in self.goals.items())
+        checkpoint["baseSizes"] = self.baseSizes
+        checkpoint["inserted"] = [[attribute, encodeValue(value), sorted(block)]
+                                  for attribute, attrValSet in self.attrValueDict.items()
+                                  for value, block in islice(attrValSet.items(),
+                                                             self.baseSizes[attribute], None)]
+        checkpoint["concepts"] = OrderedDict()
+        for decision, (ruleSet, remainingGoal) in self.concepts.items():
+            rules = [[[[attribute, encodeValue(value[0])] for attribute, value in rule[0].items()],
+                      sorted(rule[2])] for rule in ruleSet]
+            remaining = None if remainingGoal is None else sorted(remainingGoal)
+            checkpoint["concepts"][decision] = OrderedDict(rules = rules, remaining = remaining)
+
+        temporaryName = "{}.{}.tmp".format(self.checkpointFileName, os.getpid())
+        with open(temporaryName, "w") as checkpointFile:
+            json.dump(checkpoint, checkpointFile)
+        os.replace(temporaryName, self.checkpointFileName)
+        self.lastSave = time.perf_counter()
+
+    # Loads the checkpoint if it was saved for the same goals and block table. Returns True if it
+    # was loaded.
+    def load(self):
+        try:
+            with open(self.checkpointFileName) as checkpointFile:
+                checkpoint = json.load(checkpointFile)
+        except (OSError, ValueError):
+            return False
+
+        goals = OrderedDict((decision, sorted(goal)) for decision, goal in self.goals.items())
+        if (checkpoint.get("version") != __version__ or checkpoint.get("goals") != goals or
+                checkpoint.get("baseSizes") != self.baseSizes):
+            return False
+
+        for attribute, value, cases in checkpoint["inserted"]:
+            self.attrValueDict[attribute][decodeValue(value)] = newBlock(cases)
+
+        for decision, state in checkpoint["concepts"].items():
+            ruleSet = []
+            for conditions, cases in state["rules"]:
+                rules = OrderedDict((attribute, [decodeValue(value)])
+                                    for attribute, value in conditions)
+                ruleSet.append([rules, [self.attrDecision, decision], newBlock(cases)])
+            remaining = None if state["remaining"] is None else newBlock(state["remaining"])
+            self.concepts[decision] = [ruleSet, remaining]
+        return True
+
+    def remove(self):
+        if self.checkpointFileName:
+            removeCacheFile(self.checkpointFileName)
+
+# Converts a condition value to JSON (intervals become [low, high] lists) and back
+def encodeValue(value):
+    return list(value) if isinstance(value, tuple) else value
+
+def decodeValue(value):
+    return tuple(value) if isinstance(value, list) else value
+
+# The function is responsible for taking input attribute value pairs/block and a set of goals in
+# order to determine a set of rules for this dataset. No matter the specification of possible or
+# certain rules, this will produce the desired output given the correct blocks and goals.
+# knownRules can hold the result of an earlier call: concepts whose goal is the same as in that call
+# take its rules instead of being induced again. Returns the goal and rules of every concept (see
+# writeRules to export them). Intervals merged while inducing are inserted into attrValueDict unless
+# INTERVALCACHE is set, in which case the concepts share one IntervalCache instead.
+# With CaseWeights, attrValueDict is their collapsed table (weights.attrValueDict): the concepts
+# are induced over the representatives of their goals, and the rules and the cases a run leaves
+# uncovered are expanded back to every case (a checkpoint keeps the representatives).
+def mlem2(attrValueDict, attrTypes, goals, attrDecision, knownRules = None, run = None,
+          weights = None):
+    if STATUSINFO:
+        print("-------------------------------------------------------------\n")
+        print("Rule induction commencing for calculated goals:")
+        listPrint(goals.items())
+
+    searchGoals = goals
+    if weights:
+        weights = weights.induction()
+        searchGoals = OrderedDict((decision, weights.collapse(goal))
+                                  for decision, goal in goals.items())
+    if run:
+        run.begin(attrValueDict, searchGoals, attrDecision)
+
+    conceptRuleSets = OrderedDict()
+    newGoals = OrderedDict()
+    known = set()
+    for decision, goal in goals.items():
+        if knownRules and decision in knownRules and knownRules[decision][0] == goal:
+            conceptRuleSets[decision] = knownRules[decision][1]
+            known.add(decision)
+            if __instrumentation__:
+                __instrumentation__.conceptRules(decision, len(conceptRuleSets[decision]))
+        elif run and run.conceptRules(decision) is not None:
+            conceptRuleSets[decision] = run.conceptRules(decision)
+            if __instrumentation__:
+                __instrumentation__.conceptRules(decision, len(conceptRuleSets[decision]))
+        else:
+            newGoals[decision] = searchGoals[decision]
+
+    # Concepts are only worth spreading over processes when there are several to induce (a
+    # resumable run keeps to one process, which holds its state)
+    if (PARALLELCONCEPTS and not run and sum(1 for goal in newGoals.values() if goal) > 1 and
+            "fork" in multiprocessing.get_all_start_methods()):
+        conceptRuleSets.update(parallelInduction(attrValueDict, attrTypes, newGoals, attrDecision,
+                                                 weights))
+    else:
+        candidates = None
+        if INCREMENTALSEARCH:
+            candidates = CandidateIndex(attrValueDict, attrTypes, weights)
+        intervals = IntervalCache(attrValueDict) if INTERVALCACHE else None
+
+        # For every concept we're evaluating
+        for decision, originalGoal in newGoals.items():
+            if run and run.expired():
+                conceptRuleSets[decision] = (run.conceptState(decision) or ([], None))[0]
+                continue
+            conceptRuleSets[decision] = induceConcept(attrValueDict, attrTypes, decision,
+                                                      originalGoal, attrDecision, candidates,
+                                                      intervals = intervals, run = run,
+                                                      weights = weights)
+    if run:
+        run.finish()
+        if not run.complete:
+            run.save()
+
+    if weights:
+        for decision, ruleSet in conceptRuleSets.items():
+            if decision not in known:
+                conceptRuleSets[decision] = [[rules, decisionPair, weights.expand(match)]
+                                             for rules, decisionPair, match in ruleSet]
+        if run:
+            run.uncovered = OrderedDict((decision, sorted(weights.expand(cases)))
+                                        for decision, cases in run.uncovered.items())
+
+    return OrderedDict((decision, (goals[decision], conceptRuleSets[decision]))
+                       for decision in goals)
+
+# Converts the induced rules (as returned by mlem2) to ruleFormat (RULEFORMAT by default) and
+# outputs them, in concept order, to outputFileName. The LERS numbers of the rules need the
+# concepts of the dataset. If an InductionRun stopped before covering every goal, the cases it left
+# uncovered are listed at the end in "!" comment lines, numbered from 1.
+def writeRules(induced, outputFileName, ruleType, concepts = None, ruleFormat = None, run = None):
+    ruleFormat = ruleFormat or RULEFORMAT
+    ruleSet = [rule for goal, conceptRules in induced.values() for rule in conceptRules]
+
+    if ruleFormat == "text":
+        lines = makeFriendlyRules(ruleSet)
+    elif ruleFormat == "lers":
+        lines = []
+        for rule, numbers in zip(ruleSet, lersNumbers(ruleSet, concepts)):
+            lines.append("{}, {}, {}".format(*numbers))
+            lines.append(formatRule(rule[0], rule[1]))
+    elif ruleFormat == "jsonl":
+        lines = [json.dumps(ruleRecord(rule, numbers))
+                 for rule, numbers in zip(ruleSet, lersNumbers(ruleSet, concepts))]
+    else:
+        raise ValueError("unknown rule format: {}".format(ruleFormat))
+
+    if run and not run.complete:
         if STATUSINFO:
-            print("\n")
-    # Convert the induced rules to a friendly format and output them
-    printOutput(makeFriendlyRules(ruleSet))
+            print("The time budget ran out, the rules found so far are written.")
+        lines.append("! Induction stopped by its time budget, uncovered cases:")
+        for decision, uncovered in run.uncovered.items():
+            lines.append("! ({}, {}): {}".format(run.attrDecision, decision,
+                                                 " ".join(str(case + 1) for case in uncovered)))
+
+    printOutput(lines, outputFileName, ruleType)
+
+# Computes the LERS numbers of every rule from the coverage kept with it: the specificity (number
+# of conditions), the strength (cases covered that belong to the rule's concept) and the number of
+# cases matched. Certain rules only cover cases of their concept, so there strength == matches.
+def lersNumbers(ruleSet, concepts):
+    conceptBlocks = {}
+    numbers = []
+    for conditions, decision, match in ruleSet:
+        if decision[1] not in conceptBlocks:
+            conceptBlocks[decision[1]] = newBlock(concepts[decision[1]])
+        strength = len(match.intersection(conceptBlocks[decision[1]]))
+        numbers.append((len(conditions), strength, len(match)))
+    return numbers
+
+# Returns the JSON record of a rule: its conditions as [attribute, value] pairs (an interval value
+# is a [low, high] pair), its [decision name, value] and its LERS numbers
+def ruleRecord(rule, numbers):
+    record = OrderedDict()
+    record["conditions"] = []
+    for attribute, value in rule[0].items():
+        value = value[0]
+        record["conditions"].append([attribute, list(value) if isinstance(value, tuple) else value])
+    record["decision"] = list(rule[1])
+    record["specificity"], record["strength"], record["matches"] = numbers
+    return record
+
+# Formats an attribute value for output. Numeric intervals are kept as (low, high) tuples during
+# induction and are only turned into their "low..high" form here.
+def formatValue(value):
+    if isinstance(value, tuple):
+        return "{}..{}".format(value[0], value[1])
+    return value
 
 # Converts a given ruleset containing a list of attributes and values as well as decision values
 # into a friendly rule format matching (attr, value) & ... & (attr, value) -> (d, decision)
@@ -640,53 +2513,342 @@ def makeFriendlyRules(ruleSet):
 
     # Generate a friendly formatted rule for each rule in the ruleSet
     for rule in ruleSet:
-        friendlyRule = ""
-        for index, (attribute, value) in enumerate(rule[0].items()):
-            if index != 0:
-                friendlyRule +=" & "
-            friendlyRule += "({}, {})".format(attribute, value[0])
-        friendlyRule += " -> ({}, {})".format(rule[1][0], rule[1][1])
-
-        friends.append(friendlyRule)
+        friends.append(formatRule(rule[0], rule[1]))
 
     return friends
 
-# Calculates the set of rules using calculated approximations and the MLEM2 algorithm
-def calculateRules(universe, attributes, attrValueDict, attrTypes, concepts):
-    # Generate the corresponding sets (A* if complete, characteristic sets if not complete)
-    if not __incompleteDataset__:
-        sets = calculateAStar(universe)
-    else:
-        sets = calculateCSets(universe, attrValueDict, attributes, attrTypes, concepts)
+# Formats a single rule given its conditions (attribute -> list holding the value) and decision pair
+def formatRule(conditions, decision):
+    return "{} -> ({}, {})".format(" & ".join("({}, {})".format(attribute, formatValue(value[0]))
+                                             for attribute, value in conditions.items()),
+                                   decision[0], decision[1])
+
+# Generate the corresponding sets (A* if complete, characteristic sets if not complete)
+def calculateSets(universe, attributes, attrValueDict, attrTypes, concepts, specifiedIndex):
+    if not universe.incomplete:
+        return calculateAStar(universe)
+    return calculateCSets(universe, attrValueDict, attributes, attrTypes, concepts, specifiedIndex)
 
+# Calculates the set of rules using calculated approximations and the MLEM2 algorithm
+# Both approximations are calculated up front so the other set of rules needs no second pass
+def calculateRules(attributes, attrValueDict, attrTypes, concepts, sets, incomplete,
+                   weights = None):
     global __calcCertain__
-    approxType = "lower" if __calcCertain__ else "upper"
-    goals = calculateApprox(sets, concepts, approxType)
-    mlem2(attrValueDict, attrTypes, goals, attributes[-1])
+    with phase("calculateApprox"):
+        lower, upper = calculateApproximations(sets, concepts, incomplete)
+    if weights:
+        attrValueDict = weights.attrValueDict
+    goals = lower if __calcCertain__ else upper
+    ruleType = "certain" if __calcCertain__ else "possible"
+    run = resumableRun(__outputFileName__)
+    with phase("mlem2." + ruleType):
+        induced = mlem2(attrValueDict, attrTypes, goals, attributes[-1], run = run,
+                        weights = weights)
+    writeRules(induced, __outputFileName__, ruleType, concepts, run = run)
+    complete = not run or run.complete
+    if run and run.complete:
+        run.remove()
 
     # Ask the user if they want to calculate the other set of rules (certain or possible)
     if calculateOtherSet():
-        approxType = "upper" if __calcCertain__ else "lower"
-        goals = calculateApprox(sets, concepts, approxType)
+        goals = upper if __calcCertain__ else lower
         __calcCertain__ = not __calcCertain__
-        mlem2(attrValueDict, attrTypes, goals, attributes[-1])
+        ruleType = "certain" if __calcCertain__ else "possible"
+        run = resumableRun(__outputFileName__)
+        with phase("mlem2." + ruleType):
+            induced = mlem2(attrValueDict, attrTypes, goals, attributes[-1],
+                            induced if REUSERULES and complete else None, run, weights)
+        writeRules(induced, __outputFileName__, ruleType, concepts, run = run)
+        if run and run.complete:
+            run.remove()
+
+# Returns the InductionRun of the rules written to outputFileName, checkpointed next to them, when
+# CHECKPOINTINTERVAL or TIMEBUDGET is set, otherwise None
+def resumableRun(outputFileName):
+    if not CHECKPOINTINTERVAL and not TIMEBUDGET:
+        return None
+    return InductionRun(outputFileName + ".checkpoint", CHECKPOINTINTERVAL, TIMEBUDGET)
+
+# Computes the key of the preprocessing cache entry for a dataset: a hash of the file contents and
+# of everything else that changes the preprocessing result
+def preprocessCacheKey(fileName):
+    digest = hashlib.sha256()
+    digest.update("{} {}\n".format(__version__, CACHEMAGIC).encode())
+    digest.update("{} {} {}\n".format(CUTPOINTSTRATEGY, MAXCUTPOINTS, FREQUENCYBINS).encode())
+    with open(fileName, "rb") as inputFile:
+        for chunk in iter(lambda: inputFile.read(CHUNKSIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Encodes a block as whichever is smaller: a bitmap over all cases ("b") or its rows as uint32 ("r")
+def encodeBlock(block, caseCount):
+    rows = array("I", sorted(block))
+    if len(rows) * 4 < (caseCount + 7) // 8:
+        if sys.byteorder != "little":
+            rows.byteswap()
+        return "r", rows.tobytes()
+    return "b", toBits(block).to_bytes((caseCount + 7) // 8, "little")
+
+# Decodes a block written by encodeBlock into the selected block backend
+def decodeBlock(encoding, data):
+    if encoding == "b":
+        bits = int.from_bytes(data, "little")
+        return BitmapBlock.fromBits(bits) if BITMAPBLOCKS else set(BitmapBlock.fromBits(bits))
+
+    rows = array("I")
+    rows.frombytes(data)
+    if sys.byteorder != "little":
+        rows.byteswap()
+    return newBlock(rows)
+
+# Writes the preprocessed dataset to the cache directory. The file holds CACHEMAGIC, the length of
+# a JSON header, the header (attributes, types, concepts, block keys and where each block is
+# stored) and then the encoded blocks back to back, so the file can be memory-mapped when read.
+def savePreprocessed(key, caseCount, incomplete, attributes, attrTypes, concepts, attrValueDict,
+                     sets):
+    segments = []
+    data = bytearray()
+
+    # Stores a block and returns its number in the list of segments
+    def addBlock(block):
+        encoding, encoded = encodeBlock(block, caseCount)
+        segments.append([len(data), len(encoded), encoding])
+        data.extend(encoded)
+        return len(segments) - 1
+
+    header = OrderedDict()
+    header["version"] = __version__
+    header["cases"] = caseCount
+    header["incomplete"] = incomplete
+    header["attributes"] = attributes
+    header["attrTypes"] = attrTypes
+    header["concepts"] = [[decision, addBlock(concept)] for decision, concept in concepts.items()]
+    header["blocks"] = [[attribute, list(value) if isinstance(value, tuple) else value,
+                         addBlock(block)]
+                        for attribute, attrValSet in attrValueDict.items()
+                        for value, block in attrValSet.items()]
+    header["sets"] = [addBlock(block) for block in sets]
+    header["segments"] = segments
+    encodedHeader = json.dumps(header).encode()
+
+    os.makedirs(CACHEDIRECTORY, exist_ok = True)
+    fileName = os.path.join(CACHEDIRECTORY, key + ".mlc")
+    temporaryName = "{}.{}.{}.tmp".format(fileName, os.getpid(), threading.get_ident())
+    with open(temporaryName, "wb") as cacheFile:
+        cacheFile.write(CACHEMAGIC)
+        cacheFile.write(len(encodedHeader).to_bytes(4, "little"))
+        cacheFile.write(encodedHeader)
+        cacheFile.write(data)
+    os.replace(temporaryName, fileName)
+
+    trimCacheDirectory()
+
+# Reads a preprocessed dataset from the cache directory. Returns None on a miss; entries written by
+# another version of the program or that can't be read are removed.
+def loadPreprocessed(key):
+    fileName = os.path.join(CACHEDIRECTORY, key + ".mlc")
+    if not os.path.exists(fileName):
+        return None
+
+    try:
+        with open(fileName, "rb") as cacheFile, \
+             mmap.mmap(cacheFile.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+            if mapped[:len(CACHEMAGIC)] != CACHEMAGIC:
+                raise ValueError("bad cache file")
+            headerStart = len(CACHEMAGIC) + 4
+            headerEnd = headerStart + int.from_bytes(mapped[len(CACHEMAGIC):headerStart], "little")
+            header = json.loads(mapped[headerStart:headerEnd].decode())
+            if header["version"] != __version__:
+                raise ValueError("stale cache file")
+
+            # Reads the block stored as the given segment number
+            def readBlock(segment):
+                offset, length, encoding = header["segments"][segment]
+                return decodeBlock(encoding, mapped[headerEnd + offset:headerEnd + offset + length])
+
+            concepts = OrderedDict()
+            for decision, segment in header["concepts"]:
+                concepts[decision] = sorted(readBlock(segment))
+
+            attrValueDict = OrderedDict((attribute, OrderedDict())
+                                        for attribute in header["attributes"][:-1])
+            for attribute, value, segment in header["blocks"]:
+                value = tuple(value) if isinstance(value, list) else value
+                attrValueDict[attribute][value] = readBlock(segment)
+
+            sets = [readBlock(segment) for segment in header["sets"]]
+    except (OSError, ValueError, KeyError):
+        removeCacheFile(fileName)
+        return None
+
+    # Mark the entry as recently used for trimCacheDirectory
+    try:
+        os.utime(fileName)
+    except OSError:
+        pass
+
+    preprocessed = OrderedDict()
+    preprocessed["cases"] = header["cases"]
+    preprocessed["incomplete"] = header["incomplete"]
+    preprocessed["attributes"] = header["attributes"]
+    preprocessed["attrTypes"] = header["attrTypes"]
+    preprocessed["concepts"] = concepts
+    preprocessed["attrValueDict"] = attrValueDict
+    preprocessed["sets"] = sets
+    # The cases themselves aren't cached
+    preprocessed["universe"] = None
+    preprocessed["weights"] = None
+    return preprocessed
+
+# Removes the least recently used cache entries until the directory fits in CACHEMAXBYTES
+def trimCacheDirectory():
+    entries = []
+    for name in os.listdir(CACHEDIRECTORY):
+        path = os.path.join(CACHEDIRECTORY, name)
+        if name.endswith(".mlc"):
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
 
-# Prints the output ruleSet to a filename given by the user
-def printOutput(ruleSet):
+    totalSize = sum(size for modified, size, path in entries)
+    for modified, size, path in sorted(entries):
+        if totalSize <= CACHEMAXBYTES:
+            break
+        removeCacheFile(path)
+        totalSize -= size
+
+# Deletes a cache entry (another process or thread may have deleted it already)
+def removeCacheFile(fileName):
+    try:
+        os.remove(fileName)
+    except OSError:
+        pass
+
+# Prints the output ruleSet (formatted lines) to a filename given by the user
+def printOutput(ruleSet, outputFileName, ruleType):
     if STATUSINFO:
-        ruleStr = "Certain" if __calcCertain__ else "Possible"
-        print("{} rules have been induced:".format(ruleStr))
+        print("{} rules have been induced:".format(ruleType.capitalize()))
         if not ruleSet:
             print("  **No rules were produced of this type.\n")
         # else:
         #     listPrint(ruleSet)
 
-    outputFile = open(__outputFileName__, "w")
+    with open(outputFileName, "w", buffering = WRITEBUFFER) as outputFile:
+        for rule in ruleSet:
+            outputFile.write("%s\n" % rule)
+
+    if STATUSINFO: print("Rules exported successfully.\n".format(outputFileName))
+
+# Parses and preprocesses the dataset in fileName, or loads the result from the cache when
+# PREPROCESSCACHE is set. Returns the number of cases, whether the dataset is incomplete, and the
+# attributes, attrTypes, concepts, attrValueDict and sets, along with the parsed universe (None when
+# loaded from the cache) and, when COLLAPSEDUPLICATES is set, the CaseWeights of its duplicate
+# cases (None otherwise).
+def preprocess(fileName):
+    # With a warm cache, go straight to rule induction
+    if PREPROCESSCACHE:
+        cacheKey = preprocessCacheKey(fileName)
+        with phase("loadPreprocessed"):
+            preprocessed = loadPreprocessed(cacheKey)
+        if preprocessed:
+            if STATUSINFO:
+                print("Preprocessed dataset loaded from the cache.\n")
+
+            # Duplicate cases are found among the parsed cases
+            if COLLAPSEDUPLICATES:
+                with phase("parseFile"):
+                    preprocessed["universe"] = parseFile([], fileName)
+                with phase("collapseDuplicates"):
+                    preprocessed["weights"] = collapseDuplicates(preprocessed["universe"],
+                                                                 preprocessed["attrValueDict"])
+            return preprocessed
 
-    for rule in ruleSet:
-        outputFile.write("%s\n" % rule)
+    attributes = []
+    with phase("parseFile"):
+        universe = parseFile(attributes, fileName)
+
+    preprocessed = preprocessUniverse(universe, attributes)
+    if PREPROCESSCACHE:
+        with phase("savePreprocessed"):
+            savePreprocessed(cacheKey, len(universe), universe.incomplete, attributes,
+                             preprocessed["attrTypes"], preprocessed["concepts"],
+                             preprocessed["attrValueDict"], preprocessed["sets"])
+    return preprocessed
+
+# Starts the worker pool a preprocessing with PARALLELBLOCKS types the attributes and builds their
+# blocks on, one worker per core. The universe and concepts reach the workers through fork. Returns
+# a context giving None (preprocess serially) without the flag, with a single condition attribute
+# or where processes can't be forked.
+def blockPool(universe, concepts):
+    attrCount = len(universe.columns) - 1
+    if not PARALLELBLOCKS or attrCount < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        return nullcontext()
+
+    context = multiprocessing.get_context("fork")
+    return context.Pool(min(os.cpu_count() or 1, attrCount), initializer = setParallelState,
+                        initargs = ((universe, concepts),))
+
+# Preprocesses a parsed universe: its concepts, attribute types, block table, A* or characteristic
+# sets and, with COLLAPSEDUPLICATES, its duplicate cases. Returns them as preprocess does, along
+# with the universe itself.
+def preprocessUniverse(universe, attributes):
+    # Store the concepts of this dataset
+    with phase("calculateConcepts"):
+        concepts = calculateConcepts(universe)
 
-    if STATUSINFO: print("Rules exported successfully.\n".format(__outputFileName__))
+    attrValueDict = OrderedDict()
+
+    # Specified values of each attribute per concept, shared by the block and set calculations
+    specifiedIndex = OrderedDict()
+
+    with blockPool(universe, concepts) as pool:
+        #Determine what types the attributes are
+        with phase("attributeTypes"):
+            attrTypes = attributeTypes(universe, attributes, pool)
+
+        # Generate the attribute value pairs and their blocks
+        with phase("generateAVBlocks"):
+            if pool:
+                # Attributes with the most distinct values go first so the workers finish together;
+                # the tables are put back in attribute order
+                jobs = [(index, attrType, attributes[index])
+                        for index, attrType in enumerate(attrTypes)]
+                jobs.sort(key = lambda job: len(universe.dictionary(job[0])), reverse = True)
+                tables = [None] * len(jobs)
+                for job, (attrValSet, entries) in zip(jobs, pool.map(blockWorker, jobs,
+                                                                     chunksize = 1)):
+                    tables[job[0]] = attrValSet
+                    specifiedIndex.update(entries)
+                for index, attrValSet in enumerate(tables):
+                    attrValueDict[attributes[index]] = attrValSet
+            else:
+                for index, attrType in enumerate(attrTypes):
+                    attribute = attributes[index]
+                    attrValueDict[attribute] = generateAVBlocks(universe, index, attrType,
+                                                                attribute, concepts, specifiedIndex)
+
+    with phase("calculateCSets" if universe.incomplete else "calculateAStar"):
+        sets = calculateSets(universe, attributes, attrValueDict, attrTypes, concepts,
+                             specifiedIndex)
+
+    weights = None
+    if COLLAPSEDUPLICATES:
+        with phase("collapseDuplicates"):
+            weights = collapseDuplicates(universe, attrValueDict)
+
+    preprocessed = OrderedDict()
+    preprocessed["cases"] = len(universe)
+    preprocessed["incomplete"] = universe.incomplete
+    preprocessed["attributes"] = attributes
+    preprocessed["attrTypes"] = attrTypes
+    preprocessed["concepts"] = concepts
+    preprocessed["attrValueDict"] = attrValueDict
+    preprocessed["sets"] = sets
+    preprocessed["universe"] = universe
+    preprocessed["weights"] = weights
+    return preprocessed
 
 # The main function of the MLEM2 algorithm program
 # Accepts an __inputFileName__ from the user to parse. Prompts user for a type of ruleset to compute
@@ -704,22 +2866,460 @@ def main():
     # Ask the user for input/output file names and rule types to calculate
     userInput()
 
-    attributes = []
-    universe = parseFile(attributes)
-
-    # Store the concepts of this dataset
-    concepts = calculateConcepts(universe)
-
-    #Determine what types the attributes are
-    attrTypes = attributeTypes(universe, attributes)
-    attrValueDict = OrderedDict()
-
-    # Generate the attribute value pairs and their blocks
-    for index, attrType in enumerate(attrTypes):
-        attribute = attributes[index]
-        attrValueDict[attribute] = generateAVBlocks(universe, index, attrType, attribute, concepts)
+    try:
+        preprocessed = preprocess(__inputFileName__)
+    except DatasetError as error:
+        print("Error [Invalid dataset]: {}\n".format(error))
+        sys.exit()
 
     # Calculate the rulesets from the universe/attributes
-    calculateRules(universe, attributes, attrValueDict, attrTypes, concepts)
-
-main()
+    calculateRules(preprocessed["attributes"], preprocessed["attrValueDict"],
+                   preprocessed["attrTypes"], preprocessed["concepts"], preprocessed["sets"],
+                   preprocessed["incomplete"], preprocessed["weights"])
+
+# A rule induced by MLEM2. conditions maps each attribute to a list holding its value (a symbolic
+# value or a (low, high) interval), decision is the (decision name, value) pair and coverage is the
+# block of cases matched by the conditions.
+class Rule:
+    __slots__ = ("conditions", "decision", "coverage")
+
+    def __init__(self, conditions, decision, coverage = None):
+        self.conditions = conditions
+        self.decision = decision
+        self.coverage = coverage
+
+    def __str__(self):
+        return formatRule(self.conditions, self.decision)
+
+    def __repr__(self):
+        return "Rule({})".format(self)
+
+# A dataset parsed and preprocessed once (through the cache when PREPROCESSCACHE is set), ready for
+# any number of inductions. Holds the attributes, their types, the concepts, the block table, the
+# A* or characteristic sets, the lower and upper approximations of every concept and, with
+# COLLAPSEDUPLICATES, the CaseWeights of the duplicate cases (weights, None otherwise). An invalid
+# dataset file raises a DatasetError.
+# Cases appended to the dataset later can be added with append instead of preprocessing it again.
+class Dataset:
+    def __init__(self, fileName, preprocessed = None):
+        self.fileName = fileName
+        self.appended = range(0)
+        with libraryCall():
+            self.load(preprocessed or preprocess(fileName))
+
+    def load(self, preprocessed):
+        self.universe = preprocessed["universe"]
+        self.cases = preprocessed["cases"]
+        self.incomplete = preprocessed["incomplete"]
+        self.attributes = preprocessed["attributes"]
+        self.attrTypes = preprocessed["attrTypes"]
+        self.concepts = preprocessed["concepts"]
+        self.attrValueDict = preprocessed["attrValueDict"]
+        self.sets = preprocessed["sets"]
+        self.weights = preprocessed["weights"]
+        with phase("calculateApprox"):
+            self.lower, self.upper = calculateApproximations(self.sets, self.concepts,
+                                                             self.incomplete)
+
+    # Returns the goals of a rule type: the lower approximations for certain rules and the upper
+    # approximations for possible rules
+    def goals(self, ruleType):
+        if ruleType not in ("certain", "possible"):
+            raise ValueError("unknown rule type: {}".format(ruleType))
+        return self.lower if ruleType == "certain" else self.upper
+
+    # Adds the cases of a LERS file (with the same attributes) to the end of the dataset and returns
+    # their case numbers, which are also kept in appended. For a complete dataset (with the "all"
+    # cutpoint strategy), only the blocks, A* classes and approximations the new cases fall in are
+    # updated; otherwise everything but the parsing of the earlier cases is computed again. Either
+    # way the dataset ends up as if the whole file had been preprocessed. Raises a DatasetError if
+    # the file is invalid or its attributes aren't those of the dataset.
+    def append(self, fileName):
+        with libraryCall():
+            attributes = []
+            with phase("parseFile"):
+                newCases = parseFile(attributes, fileName)
+            if attributes != self.attributes:
+                raise DatasetError("The appended cases have different attributes.")
+
+            universe = self.caseTable()
+            knownValues = [len(universe.dictionary(index)) for index in range(len(attributes))]
+            rows = range(len(universe), len(universe) + len(newCases))
+            universe.appendTokens([token for case in newCases for token in case])
+            universe.numericColumns = {}
+            universe.incomplete = universe.incomplete or newCases.incomplete
+
+            if universe.incomplete or CUTPOINTSTRATEGY != "all" or MAXCUTPOINTS:
+                self.load(preprocessUniverse(universe, attributes))
+            else:
+                for row in rows:
+                    self.concepts.setdefault(universe.value(row, -1), []).append(row)
+
+                with phase("generateAVBlocks"):
+                    for index, attrType in enumerate(self.attrTypes):
+                        attribute = attributes[index]
+                        self.attrValueDict[attribute] = appendAVBlocks(
+                            universe, index, attrType, self.attrValueDict[attribute], rows,
+                            knownValues[index])
+                with phase("calculateAStar"):
+                    self.sets, self.lower, self.upper = appendAStar(
+                        universe, self.sets, self.lower, self.upper, self.concepts, rows)
+                if COLLAPSEDUPLICATES:
+                    with phase("collapseDuplicates"):
+                        self.weights = collapseDuplicates(universe, self.attrValueDict)
+                self.cases = len(universe)
+
+            self.appended = rows
+            return rows
+
+    # Returns the parsed cases of the dataset. A dataset loaded from the cache is parsed now, and
+    # its file must not have changed (DatasetError).
+    def caseTable(self):
+        if self.universe is None:
+            with phase("parseFile"):
+                universe = parseFile([], self.fileName)
+            if len(universe) != self.cases:
+                raise DatasetError("The dataset file has changed.")
+            self.universe = universe
+        return self.universe
+
+    # Returns a Dataset of the given cases only, as if they were preprocessed on their own (used to
+    # train on part of a dataset). For a complete dataset (with the "all" cutpoint strategy) the
+    # blocks, A* classes and concepts are masked to the cases, which keep their case numbers;
+    # otherwise the cases are preprocessed again, numbered from 0 in the order given.
+    def subset(self, rows):
+        with libraryCall():
+            universe = self.caseTable()
+            if self.incomplete or CUTPOINTSTRATEGY != "all" or MAXCUTPOINTS:
+                table = universe.subset(rows)
+                return Dataset(self.fileName, preprocessUniverse(table, list(self.attributes)))
+
+            mask = newBlock(rows)
+            concepts = []
+            for decision, concept in self.concepts.items():
+                concept = [case for case in concept if case in mask]
+                if concept:
+                    concepts.append((concept[0], decision, concept))
+            concepts.sort(key = lambda entry: entry[0])
+
+            preprocessed = OrderedDict()
+            preprocessed["cases"] = len(mask)
+            preprocessed["incomplete"] = False
+            preprocessed["attributes"] = self.attributes
+            preprocessed["attrTypes"] = self.attrTypes
+            preprocessed["concepts"] = OrderedDict((decision, concept)
+                                                   for first, decision, concept in concepts)
+            with phase("generateAVBlocks"):
+                preprocessed["attrValueDict"] = OrderedDict(
+                    (attribute, maskAVBlocks(universe, index, self.attrTypes[index],
+                                             self.attrValueDict[attribute], mask))
+                    for index, attribute in enumerate(self.attributes[:-1]))
+            with phase("calculateAStar"):
+                preprocessed["sets"] = [block for block in (aSet & mask for aSet in self.sets)
+                                        if block]
+            preprocessed["universe"] = universe
+            preprocessed["weights"] = None
+            if COLLAPSEDUPLICATES:
+                with phase("collapseDuplicates"):
+                    preprocessed["weights"] = collapseDuplicates(
+                        universe, preprocessed["attrValueDict"], rows)
+            return Dataset(self.fileName, preprocessed)
+
+# Induces the certain or possible rules of a Dataset and returns them as a list of Rule objects in
+# concept order. Each call induces on its own copy of the block table and leaves the dataset as it
+# was, so a dataset can be induced any number of times and datasets can be induced from several
+# threads at once, as long as instrumentation is off (see libraryCall). The engine flags are read,
+# never changed, and apply to every call.
+# With an InductionRun, the induction can be checkpointed, resumed and stopped by a time budget;
+# run.complete then tells whether the rules cover every goal.
+def induce(dataset, ruleType = "certain", run = None):
+    goals = dataset.goals(ruleType)
+    weights = dataset.weights
+    with libraryCall(), phase("mlem2." + ruleType):
+        induced = mlem2(copyBlockTable(weights.attrValueDict if weights else dataset.attrValueDict),
+                        dataset.attrTypes, goals, dataset.attributes[-1], run = run,
+                        weights = weights)
+    return [Rule(conditions, tuple(decision), coverage)
+            for goal, conceptRules in induced.values()
+            for conditions, decision, coverage in conceptRules]
+
+# Updates the rules of a Dataset (as induce returns them) after cases were appended to it: a rule
+# is kept if the cases it covers, the new ones included, are still all in its concept's goal, and
+# rules are only induced for the goal cases the kept rules leave uncovered. The induction picks up
+# from the kept rules of every concept the way a resumed InductionRun does. rows holds the case
+# numbers of the new cases (dataset.appended by default); conditions are only matched against those
+# rows, so an incomplete dataset, where missing values change what a condition matches, is induced
+# again in full. The kept rules cover every case, so duplicate cases aren't collapsed here.
+# Returns the new rules in concept order.
+def updateRules(dataset, rules, ruleType = "certain", rows = None):
+    if dataset.incomplete:
+        return induce(dataset, ruleType)
+    if rows is None:
+        rows = dataset.appended
+
+    goals = dataset.goals(ruleType)
+    attrIndices = dict((attribute, index) for index, attribute in enumerate(dataset.attributes))
+    run = InductionRun()
+    for decision in goals:
+        run.concepts[decision] = [[], newBlock(goals[decision])]
+
+    with libraryCall(), phase("updateRules"):
+        universe = dataset.caseTable()
+        for rule in rules:
+            matched = []
+            for row in rows:
+                for attribute, value in rule.conditions.items():
+                    index = attrIndices[attribute]
+                    value = value[0]
+                    if isinstance(value, tuple):
+                        if not value[0] <= universe.numericColumn(index)[row] <= value[1]:
+                            break
+                    elif universe.value(row, index) != value:
+                        break
+                else:
+                    matched.append(row)
+            coverage = rule.coverage.union(matched) if matched else rule.coverage
+
+            decision = rule.decision[1]
+            if decision in goals and coverage.issubset(goals[decision]):
+                state = run.concepts[decision]
+                state[0].append([rule.conditions, list(rule.decision), coverage])
+                state[1] = state[1] - coverage
+
+    with libraryCall(), phase("mlem2." + ruleType):
+        induced = mlem2(copyBlockTable(dataset.attrValueDict), dataset.attrTypes, goals,
+                        dataset.attributes[-1], run = run)
+    return [Rule(conditions, tuple(decision), coverage)
+            for goal, conceptRules in induced.values()
+            for conditions, decision, coverage in conceptRules]
+
+# Engine and output flags that batch jobs pass on to their worker processes
+BATCHFLAGS = ["STATUSINFO", "BITMAPBLOCKS", "INCREMENTALSEARCH", "PREPROCESSCACHE",
+              "PARALLELCONCEPTS", "PARALLELBLOCKS", "REUSERULES", "REDUNDANTRULES",
+              "INTERVALCACHE", "LAZYBLOCKS", "COLLAPSEDUPLICATES"]
+
+# Settings that batch jobs pass on to their worker processes along with the flags
+BATCHSETTINGS = ["CUTPOINTSTRATEGY", "MAXCUTPOINTS", "FREQUENCYBINS", "CHECKPOINTINTERVAL",
+                 "TIMEBUDGET"]
+
+# Induces the given types of rules ("certain" or "possible") for one dataset without any prompts,
+# writing each to the matching output file. Several rule types share one preprocessing and
+# approximation pass (and their rules when REUSERULES is set).
+# The rules are written in ruleFormat (RULEFORMAT by default).
+# With statsFileName, the job is instrumented (with the given profile) and its report is saved
+# there.
+# With CHECKPOINTINTERVAL or TIMEBUDGET, each rule file is checkpointed next to it (see
+# InductionRun) and a rerun of the job resumes from there. Returns "partial" if a time budget ran
+# out before every goal was covered.
+def runBatchJob(inputFileName, ruleTypes, outputFileNames, flags, statsFileName = None,
+                profile = None, ruleFormat = None):
+    globals().update(flags)
+    if statsFileName:
+        startInstrumentation(profile)
+
+    preprocessed = preprocess(inputFileName)
+    with phase("calculateApprox"):
+        lower, upper = calculateApproximations(preprocessed["sets"], preprocessed["concepts"],
+                                               preprocessed["incomplete"])
+
+    weights = preprocessed["weights"]
+    attrValueDict = weights.attrValueDict if weights else preprocessed["attrValueDict"]
+    induced = None
+    status = None
+    for ruleType, outputFileName in zip(ruleTypes, outputFileNames):
+        goals = lower if ruleType == "certain" else upper
+        run = resumableRun(outputFileName)
+        with phase("mlem2." + ruleType):
+            induced = mlem2(attrValueDict, preprocessed["attrTypes"], goals,
+                            preprocessed["attributes"][-1], induced if REUSERULES else None, run,
+                            weights)
+        writeRules(induced, outputFileName, ruleType, preprocessed["concepts"], ruleFormat, run)
+        if run and run.complete:
+            run.remove()
+        elif run:
+            # The rules of a stopped run don't cover their goals, so they can't be reused
+            status = "partial"
+            induced = None
+
+    if statsFileName:
+        stopInstrumentation().save(statsFileName)
+    return status
+
+# Entry point of a batch worker process: runs the job and reports its status and runtime
+def batchWorker(job, connection):
+    start = time.perf_counter()
+    try:
+        status = runBatchJob(*job) or "ok"
+    except DatasetError as error:
+        print("Error [Invalid dataset]: {}\n".format(error))
+        status = "invalid"
+    except Exception as error:
+        status = "error ({})".format(type(error).__name__)
+    connection.send((status, time.perf_counter() - start))
+    connection.close()
+
+# Runs the batch jobs over at most `workers` processes at a time, stopping any job that runs for
+# more than `timeout` seconds. Each job runs in worker(job, connection), which sends back its
+# result.
+# Returns the result of every job in job order (a (status, seconds) pair for a timeout or crash).
+def runBatch(jobs, workers, timeout, worker = batchWorker):
+    pending = list(enumerate(jobs))
+    running = {}
+    results = [None] * len(jobs)
+
+    while pending or running:
+        # Start jobs while there are free workers
+        while pending and len(running) < workers:
+            index, job = pending.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex = False)
+            process = multiprocessing.Process(target = worker, args = (job, sender))
+            process.start()
+            sender.close()
+            running[receiver] = (index, process, time.perf_counter())
+
+        # Wait for a job to finish, or until the next job would time out
+        now = time.perf_counter()
+        nextDeadline = min(started + timeout for index, process, started in running.values())
+        for receiver in wait(list(running), max(nextDeadline - now, 0) if timeout else None):
+            index, process, started = running.pop(receiver)
+            try:
+                results[index] = receiver.recv()
+            except EOFError:
+                results[index] = ("crashed", time.perf_counter() - started)
+            process.join()
+
+        # Stop the jobs that are over their time
+        now = time.perf_counter()
+        for receiver, (index, process, started) in list(running.items()):
+            if timeout and now - started >= timeout:
+                process.terminate()
+                process.join()
+                running.pop(receiver)
+                results[index] = ("timeout", now - started)
+
+    return results
+
+# Expands the dataset arguments of batch mode: files, directories (every .txt file inside) and globs
+def batchInputFiles(patterns):
+    fileNames = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            fileNames.extend(sorted(glob.glob(os.path.join(pattern, "*.txt"))))
+        else:
+            fileNames.extend(sorted(glob.glob(pattern)) or [pattern])
+    return fileNames
+
+# Non-interactive mode: induces every requested rule type for every dataset on a pool of worker
+# processes and prints a summary of the runtimes
+def batchMain(argv):
+    parser = argparse.ArgumentParser(description = "Induce MLEM2 rules for many datasets at once.")
+    parser.add_argument("datasets", nargs = "+", help = "dataset files, directories or globs")
+    parser.add_argument("--rules", nargs = "+", choices = ["certain", "possible"],
+                        default = ["certain", "possible"], help = "rule types to induce")
+    parser.add_argument("--output", default = "rules", help = "directory for the rule files")
+    parser.add_argument("--jobs", type = int, default = os.cpu_count() or 1,
+                        help = "number of worker processes")
+    parser.add_argument("--timeout", type = float, default = 0,
+                        help = "seconds allowed per job (0 for no limit)")
+    parser.add_argument("--bitmap", action = "store_true", help = "use bitmap blocks")
+    parser.add_argument("--incremental", action = "store_true", help = "use incremental search")
+    parser.add_argument("--cache", action = "store_true", help = "use the preprocessing cache")
+    parser.add_argument("--parallel-concepts", action = "store_true",
+                        help = "induce the concepts of each job in parallel")
+    parser.add_argument("--parallel-blocks", action = "store_true",
+                        help = "build the blocks of each job's attributes in parallel")
+    parser.add_argument("--drop-redundant", action = "store_true",
+                        help = "drop rules covered by the other rules of their concept")
+    parser.add_argument("--interval-cache", action = "store_true",
+                        help = "keep merged intervals out of the block table")
+    parser.add_argument("--lazy-blocks", action = "store_true",
+                        help = "build the cases of numeric blocks only when they are used")
+    parser.add_argument("--collapse-duplicates", action = "store_true",
+                        help = "induce over one weighted case per group of duplicate cases")
+    parser.add_argument("--single-pass", action = "store_true",
+                        help = "induce all rule types of a dataset in one job, reusing rules")
+    parser.add_argument("--cutpoints", choices = CUTPOINTSTRATEGIES, default = CUTPOINTSTRATEGY,
+                        help = "cutpoint strategy of numeric attributes")
+    parser.add_argument("--max-cutpoints", type = int, default = MAXCUTPOINTS,
+                        help = "cutpoints kept per numeric attribute (0 for no cap)")
+    parser.add_argument("--bins", type = int, default = FREQUENCYBINS,
+                        help = "intervals of the frequency cutpoint strategy")
+    parser.add_argument("--format", choices = RULEFORMATS, default = RULEFORMAT,
+                        help = "format of the rule files")
+    parser.add_argument("--checkpoint-interval", type = float, default = CHECKPOINTINTERVAL,
+                        help = "seconds between checkpoints of a job, which a rerun resumes from")
+    parser.add_argument("--budget", type = float, default = TIMEBUDGET,
+                        help = "seconds of induction per rule file, after which the rules found "
+                               "so far are written (0 for no limit)")
+    parser.add_argument("--stats", action = "store_true",
+                        help = "write the timings and counters of every job as JSON")
+    parser.add_argument("--profile", choices = ["tracemalloc", "cprofile"],
+                        help = "profile every phase of the jobs (implies --stats)")
+    args = parser.parse_args(argv)
+
+    flags = OrderedDict((flag, globals()[flag]) for flag in BATCHFLAGS + BATCHSETTINGS)
+    flags["BITMAPBLOCKS"] = flags["BITMAPBLOCKS"] or int(args.bitmap)
+    flags["INCREMENTALSEARCH"] = flags["INCREMENTALSEARCH"] or int(args.incremental)
+    flags["PREPROCESSCACHE"] = flags["PREPROCESSCACHE"] or int(args.cache)
+    flags["PARALLELCONCEPTS"] = flags["PARALLELCONCEPTS"] or int(args.parallel_concepts)
+    flags["PARALLELBLOCKS"] = flags["PARALLELBLOCKS"] or int(args.parallel_blocks)
+    flags["REUSERULES"] = flags["REUSERULES"] or int(args.single_pass)
+    flags["REDUNDANTRULES"] = flags["REDUNDANTRULES"] or int(args.drop_redundant)
+    flags["INTERVALCACHE"] = flags["INTERVALCACHE"] or int(args.interval_cache)
+    flags["LAZYBLOCKS"] = flags["LAZYBLOCKS"] or int(args.lazy_blocks)
+    flags["COLLAPSEDUPLICATES"] = flags["COLLAPSEDUPLICATES"] or int(args.collapse_duplicates)
+    flags["CUTPOINTSTRATEGY"] = args.cutpoints
+    flags["MAXCUTPOINTS"] = args.max_cutpoints
+    flags["FREQUENCYBINS"] = args.bins
+    flags["CHECKPOINTINTERVAL"] = args.checkpoint_interval
+    flags["TIMEBUDGET"] = args.budget
+
+    os.makedirs(args.output, exist_ok = True)
+    jobs = []
+    for inputFileName in batchInputFiles(args.datasets):
+        name = os.path.splitext(os.path.basename(inputFileName))[0]
+        ruleTypes = list(OrderedDict.fromkeys(args.rules))
+        extension = "jsonl" if args.format == "jsonl" else "txt"
+        outputFileNames = [os.path.join(args.output, "{}.{}.{}".format(name, ruleType, extension))
+                           for ruleType in ruleTypes]
+
+        # One job per dataset in a single pass, otherwise one job per dataset and rule type
+        if args.single_pass:
+            jobRules = [(ruleTypes, outputFileNames)]
+        else:
+            jobRules = [([ruleType], [outputFileName])
+                        for ruleType, outputFileName in zip(ruleTypes, outputFileNames)]
+
+        for jobTypes, jobOutputs in jobRules:
+            statsFileName = None
+            if args.stats or args.profile:
+                statsFileName = os.path.join(args.output, "{}.{}.stats.json".format(
+                    name, "+".join(jobTypes)))
+            jobs.append((inputFileName, jobTypes, jobOutputs, flags, statsFileName, args.profile,
+                         args.format))
+
+    start = time.perf_counter()
+    results = runBatch(jobs, max(args.jobs, 1), args.timeout)
+
+    print("{:<30} {:<17} {:<16} {:>10} {:>7}".format("Dataset", "Rules", "Status", "Time (s)",
+                                                     "Count"))
+    for job, (status, seconds) in zip(jobs, results):
+        inputFileName, ruleTypes, outputFileNames = job[:3]
+        counts = []
+        if status in ("ok", "partial"):
+            for outputFileName in outputFileNames:
+                with open(outputFileName) as outputFile:
+                    counts.append(str(sum(1 for line in outputFile
+                                          if "->" in line or line.startswith("{"))))
+        print("{:<30} {:<17} {:<16} {:>10.2f} {:>7}".format(os.path.basename(inputFileName),
+                                                            "+".join(ruleTypes), status, seconds,
+                                                            "/".join(counts)))
+    print("\n{} jobs finished in {:.2f}s on {} workers.".format(len(jobs),
+                                                               time.perf_counter() - start,
+                                                               max(args.jobs, 1)))
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        batchMain(sys.argv[1:])
+    else:
+        main()